@@ -0,0 +1,7 @@
+CREATE TABLE "ingestion_state" (
+	"namespace" text NOT NULL,
+	"key" text NOT NULL,
+	"value" jsonb NOT NULL,
+	"updated_at" timestamp DEFAULT now(),
+	CONSTRAINT "ingestion_state_namespace_key_pk" PRIMARY KEY("namespace","key")
+);
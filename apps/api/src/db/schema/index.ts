@@ -4,4 +4,5 @@ export * from './platforms';
 export * from './assets';
 export * from './tooltips';
 export * from './onboarding';
-export * from './game-setup';
\ No newline at end of file
+export * from './game-setup';
+export * from './ingestion';
\ No newline at end of file
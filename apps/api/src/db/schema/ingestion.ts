@@ -0,0 +1,12 @@
+import { pgTable, text, timestamp, jsonb, primaryKey } from 'drizzle-orm/pg-core';
+
+// État persistant des jobs d'ingestion Python (lovelace.store.StateStore) : curseurs du backfill
+// Discord, tiers OpenCritic, sandboxId Epic... Les conteneurs Kestra sont éphémères.
+export const ingestionState = pgTable('ingestion_state', {
+  namespace: text('namespace').notNull(), // ex: 'opencritic_tiers', 'discord_backfill_<guildId>'
+  key: text('key').notNull(),
+  value: jsonb('value').notNull(),
+  updatedAt: timestamp('updated_at').defaultNow(),
+}, (table) => ({
+  pk: primaryKey({ columns: [table.namespace, table.key] }),
+}));
@@ -1,11 +1,70 @@
 import os
-import json
-import pandas as pd
-import dlt
-import boto3
-from io import BytesIO
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from lovelace import metrics, profiling
+from lovelace.s3 import download_all, is_pattern, list_keys, local_path, transfer_config
+from lovelace.tabular import (
+    detect_format, fetch_clickhouse_types, parse_mapping, read_file, read_spilled, spill_file
+)
+
+# pandas (historique, inférence de types) | arrow (types explicites depuis MAPPING_JSON / la table ClickHouse)
+CSV_ENGINE = os.getenv("CSV_ENGINE", "pandas")
+# Processus de parse pour les imports multi-fichiers (préfixe ou glob dans S3_KEY)
+CSV_PARSE_WORKERS = int(os.getenv("CSV_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+S3_TMP_DIR = os.getenv("S3_TMP_DIR") or None
+
+def read_many(s3, bucket, keys, mapping, game_id, stats, types):
+    """
+    Téléchargements parallèles (GET par plages pour les gros objets), parse réparti sur un pool
+    de processus, et restitution des batches dans l'ordre des clés pour un seul pipeline DLT.
+    """
+    with tempfile.TemporaryDirectory(dir=S3_TMP_DIR) as workdir:
+        downloads = download_all(s3, bucket, keys, workdir)
+        # spawn : on ne forke pas un processus qui a déjà des threads boto3 en vol
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=CSV_PARSE_WORKERS, mp_context=ctx) as pool:
+            parsed = {}
+
+            def submit(key):
+                with metrics.timer("download"):
+                    path = downloads[key].result()
+                parsed[key] = pool.submit(
+                    spill_file, path, local_path(workdir, key) + ".arrow",
+                    CSV_ENGINE, mapping, game_id, types
+                )
+                print(f"   ⬇️ {key} téléchargé, parse en cours")
+
+            # Fenêtre de parse en avance sur le chargement, pour borner l'espace disque des fichiers Arrow
+            ahead = CSV_PARSE_WORKERS * 2
+            submitted = 0
+            for i, key in enumerate(keys):
+                while submitted < min(len(keys), i + ahead):
+                    submit(keys[submitted])
+                    submitted += 1
+
+                with metrics.timer("parse"):
+                    file_stats = parsed.pop(key).result()
+                for batch in read_spilled(local_path(workdir, key) + ".arrow"):
+                    yield batch
+                stats["rows"] += file_stats["rows"]
+                stats["chunks"] += file_stats["chunks"]
+                print(f"   📦 {key} : {file_stats['rows']} lignes ({stats['rows']} au total)")
+
+def read_downloaded(s3, bucket, key, mapping, game_id, stats):
+    """Fichier unique non lisible en flux (Parquet) : téléchargé en local puis lu paresseusement."""
+    with tempfile.TemporaryDirectory(dir=S3_TMP_DIR) as workdir:
+        path = local_path(workdir, key)
+        with metrics.timer("download"):
+            s3.download_file(bucket, key, path, Config=transfer_config())
+        yield from read_file(path, key, CSV_ENGINE, mapping, game_id, stats)
 
 def run_pipeline():
+    # dlt et boto3 ne servent qu'au processus principal : les workers de parse (spawn)
+    # réimportent ce script et n'ont besoin que de lovelace.tabular
+    import dlt
+    import boto3
+
     # 1. Configuration S3
     s3_key = os.getenv("S3_KEY")
     s3_bucket = os.getenv("S3_BUCKET", "lovelace-imports")
@@ -25,13 +84,15 @@ def run_pipeline():
     os.environ["DESTINATION__CLICKHOUSE__CREDENTIALS__HOST"] = os.getenv("CH_HOST", "lovelace-clickhouse")
     os.environ["DESTINATION__CLICKHOUSE__CREDENTIALS__DATABASE"] = os.getenv("CH_DB", "default")
     os.environ["DESTINATION__CLICKHOUSE__CREDENTIALS__PORT"] = os.getenv("CH_PORT", "8123")
+    # Une colonne élargie en texte en cours de fichier (cast_chunk) : DLT promeut la colonne au lieu d'échouer
+    os.environ.setdefault("DATA_WRITER__ARROW_CONCAT_PROMOTE_OPTIONS", "default")
 
     if not s3_key or not target_table:
         raise ValueError("❌ Missing S3_KEY or TARGET_TABLE environment variables")
 
     print(f"🚀 Starting CSV ingestion for {target_table} (Game: {game_id})")
 
-    # 4. Téléchargement depuis S3
+    # 4. Téléchargement depuis S3 (clé unique en flux, ou préfixe/glob en parallèle)
     s3 = boto3.client(
         "s3",
         endpoint_url=s3_endpoint,
@@ -39,45 +100,56 @@ def run_pipeline():
         aws_secret_access_key=s3_secret_key
     )
 
-    print(f"📥 Downloading {s3_key} from {s3_bucket}...")
-    obj = s3.get_object(Bucket=s3_bucket, Key=s3_key)
-    df = pd.read_csv(BytesIO(obj["Body"].read()))
-    
-    print(f"✅ Loaded {len(df)} rows.")
-
-    # 5. Application du Mapping
-    try:
-        mapping = json.loads(mapping_str)
-        if mapping:
-            print(f"🔄 Applying mapping: {mapping}")
-            # Le mapping est supposé être : { "Nom Colonne CSV": "nom_colonne_clickhouse" }
-            df.rename(columns=mapping, inplace=True)
-    except Exception as e:
-        print(f"⚠️ Error parsing MAPPING_JSON: {e}")
-
-    # 6. Ajout du game_id
-    if game_id:
-        df["game_id"] = game_id
-    
-    # Nettoyage automatique des noms de colonnes pour ClickHouse (snake_case)
-    df.columns = [c.strip().replace(' ', '_').lower() for c in df.columns]
+    # 5. Mapping + game_id + snake_case, appliqués par chunk pendant la lecture
+    mapping, mapping_types = parse_mapping(mapping_str)
+    stats = {"rows": 0, "chunks": 0}
+    types = {}
+    if CSV_ENGINE == "arrow":
+        # Types : table ClickHouse existante (nommage DLT dataset___table), surchargés par MAPPING_JSON
+        types = {**fetch_clickhouse_types(f"ingestion_bronze___{target_table}"), **mapping_types}
 
-    # 7. Ingestion via DLT
+    if is_pattern(s3_key):
+        keys = list_keys(s3, s3_bucket, s3_key)
+        if not keys:
+            raise ValueError(f"❌ No object matches {s3_key} in {s3_bucket}")
+        print(f"📥 {len(keys)} fichiers sous {s3_key} (moteur {CSV_ENGINE}, {CSV_PARSE_WORKERS} processus)...")
+        chunks = read_many(s3, s3_bucket, keys, mapping, game_id, stats, types)
+    elif detect_format(s3_key)[0] == "parquet":
+        # Le Parquet se lit par la fin (footer) : on le pose sur disque, GET par plages compris
+        print(f"📥 Downloading {s3_key} from {s3_bucket} (Parquet)...")
+        chunks = read_downloaded(s3, s3_bucket, s3_key, mapping, game_id, stats)
+    else:
+        print(f"📥 Streaming {s3_key} from {s3_bucket} (moteur {CSV_ENGINE})...")
+        obj = s3.get_object(Bucket=s3_bucket, Key=s3_key)
+        chunks = read_file(obj["Body"], s3_key, CSV_ENGINE, mapping, game_id, stats, types)
+
+    # 6. Ingestion via DLT (le générateur est consommé chunk par chunk pendant l'extraction)
     pipeline = dlt.pipeline(
         pipeline_name=f"csv_import_{target_table}",
         destination="clickhouse",
         dataset_name="ingestion_bronze" 
     )
 
+    # extract / normalize / load séparés (équivalent de pipeline.run) pour chronométrer chaque étape ;
+    # "read" isole le temps passé à lire et parser le flux S3 pendant l'extract
     print(f"📤 Sending data to ClickHouse table: {target_table}...")
-    load_info = pipeline.run(
-        df,
-        table_name=target_table,
-        write_disposition="append"
-    )
+    with metrics.timer("extract"):
+        pipeline.extract(
+            dlt.resource(metrics.timed_iter(chunks, "read"), name=target_table),
+            table_name=target_table,
+            write_disposition="append"
+        )
+    with metrics.timer("normalize"):
+        pipeline.normalize()
+    with metrics.timer("db_write"):
+        load_info = pipeline.load()
 
+    metrics.incr("rows", stats["rows"])
     print(load_info)
-    print(f"🎉 Ingestion de {len(df)} lignes terminée !")
+    print(metrics.summary())
+    metrics.export("csv_to_clickhouse")
+    print(f"🎉 Ingestion de {stats['rows']} lignes terminée !")
 
 if __name__ == "__main__":
-    run_pipeline()
\ No newline at end of file
+    with profiling.profiled("csv_to_clickhouse"):
+        run_pipeline()
\ No newline at end of file
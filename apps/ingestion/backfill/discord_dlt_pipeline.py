@@ -1,72 +1,149 @@
 import os
-import json
 import dlt
 import discord
 import asyncio
+import time
+import threading
 from datetime import datetime, timezone
-from typing import Any, Dict, Iterator, Iterable
-from kafka import KafkaProducer
+from typing import Any, Dict, Iterable, List
+from lovelace import metrics, producer, profiling
+from lovelace.aiobridge import iter_async_chunks
+from lovelace.serializers import get_serializer
+from lovelace.store import StateStore
 
 # --- CONFIGURATION ---
+# Validée au lancement (check_config) : importer le module n'a pas d'effet de bord
 DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
-if not DISCORD_TOKEN:
-    raise ValueError("❌ La variable d'environnement DISCORD_TOKEN est manquante.")
+GUILD_ID = 0
 
-try:
-    GUILD_ID = int(os.getenv("GUILD_ID", "0"))
-except ValueError:
-    raise ValueError("❌ La variable GUILD_ID doit être un entier.")
-
-if GUILD_ID == 0:
-    raise ValueError("❌ La variable d'environnement GUILD_ID est manquante.")
+def check_config() -> int:
+    """Vérifie DISCORD_TOKEN et renvoie GUILD_ID en entier."""
+    if not DISCORD_TOKEN:
+        raise ValueError("❌ La variable d'environnement DISCORD_TOKEN est manquante.")
+    try:
+        guild_id = int(os.getenv("GUILD_ID", "0"))
+    except ValueError:
+        raise ValueError("❌ La variable GUILD_ID doit être un entier.")
+    if guild_id == 0:
+        raise ValueError("❌ La variable d'environnement GUILD_ID est manquante.")
+    return guild_id
 
-# Kafka Config
-KAFKA_BROKERS = os.getenv("KAFKA_BROKERS", "localhost:19092")
+# Kafka Config (brokers, compression, linger : voir lovelace.producer)
 KAFKA_TOPIC = "ingestion-discord"
+# Pages de messages en attente entre le fetch Discord et l'extraction DLT (backpressure)
+BRIDGE_MAX_PAGES = int(os.getenv("BRIDGE_MAX_PAGES", "20"))
+# Flush du producer + commit des curseurs tous les N messages (et en fin de round)
+BACKFILL_CHECKPOINT_EVERY = int(os.getenv("BACKFILL_CHECKPOINT_EVERY", "10000"))
+
+# Nombre de salons lus en parallèle (discord.py gère les rate limits par route)
+BACKFILL_CONCURRENCY = int(os.getenv("BACKFILL_CONCURRENCY", "4"))
+
+# Fenêtre de backfill (ISO 8601). Sans BACKFILL_END on va jusqu'à maintenant.
+def parse_date(value: str):
+    if not value:
+        return None
+    date = datetime.fromisoformat(value)
+    return date if date.tzinfo else date.replace(tzinfo=timezone.utc)
 
-# Date Range
-START_DATE = datetime(2023, 1, 1, tzinfo=timezone.utc)
-END_DATE = datetime(2025, 12, 31, tzinfo=timezone.utc)
+START_DATE = parse_date(os.getenv("BACKFILL_START", "2023-01-01"))
+END_DATE = parse_date(os.getenv("BACKFILL_END", ""))
 
-# Discord Client
-intents = discord.Intents.default()
-intents.message_content = True
-client = discord.Client(intents=intents)
+# Taille d'un round : DLT extrait tout avant de charger, on découpe donc le backfill
+# en rounds pour que les checkpoints avancent au fil de l'eau (reprise après crash)
+BACKFILL_ROUND_SIZE = int(os.getenv("BACKFILL_ROUND_SIZE", "50000"))
+# Découpage temporel des gros salons : au-delà de ~BACKFILL_SLICE_SIZE messages estimés,
+# la fenêtre est coupée en tranches lues en parallèle (max BACKFILL_MAX_SLICES)
+BACKFILL_SLICE_SIZE = int(os.getenv("BACKFILL_SLICE_SIZE", "20000"))
+BACKFILL_MAX_SLICES = int(os.getenv("BACKFILL_MAX_SLICES", "8"))
+# BACKFILL_RESET=1 ignore les curseurs et repart du début de la fenêtre
+BACKFILL_RESET = os.getenv("BACKFILL_RESET", "0") == "1"
+
+# Curseurs par salon (dernier message envoyé à Redpanda), persistés dans Postgres (ingestion_state)
+# avec DB_URL, sinon en sqlite local : seul Postgres survit au conteneur Kestra.
+# Ouverts au lancement, une fois GUILD_ID connu.
+checkpoints: StateStore = None
 
 # --- CUSTOM DESTINATION : REDPANDA ---
-def json_serializer(obj):
-    if isinstance(obj, (datetime,)):
-        return obj.isoformat()
-    raise TypeError(f"Type {type(obj)} not serializable")
+# Encodage des messages (json / orjson / avro) : voir lovelace.serializers
+serialize = get_serializer(KAFKA_TOPIC)
+
+# Curseurs des messages envoyés mais pas encore confirmés par un flush
+pending_cursors: Dict[str, int] = {}
+pending_count = 0
+pending_lock = threading.Lock()
+# DLT peut charger avec plusieurs threads : un checkpoint à la fois (lecture/écriture des curseurs)
+checkpoint_lock = threading.Lock()
 
-@dlt.destination(batch_size=100, name="redpanda")
+@dlt.destination(batch_size=producer.DLT_BATCH_SIZE, name="redpanda")
 def kafka_destination(items: Iterable[Dict[str, Any]], table_schema: Any) -> None:
     """
     Cette fonction reçoit des lots (batchs) d'items depuis DLT
-    et les envoie dans Redpanda.
+    et les envoie dans Redpanda via le producer partagé du process (pas de flush par lot).
     """
-    # Initialisation du Producer (une fois par worker/batch idéalement, mais ici ok)
-    producer = KafkaProducer(
-        bootstrap_servers=KAFKA_BROKERS,
-        value_serializer=lambda v: json.dumps(v, default=json_serializer).encode('utf-8')
-    )
-
+    global pending_count
     count = 0
     for item in items:
         # On utilise l'ID du message comme clé pour garantir l'ordre/unicité partition
         key = str(item.get("id", "")).encode('utf-8')
+        with metrics.timer("serialize"):
+            value = serialize(item)
         
         # Envoi asynchrone
-        producer.send(KAFKA_TOPIC, key=key, value=item)
+        producer.send(KAFKA_TOPIC, key, value)
         count += 1
-    
-    # On force l'envoi du batch
-    producer.flush()
+
+        cursor = cursor_key(item["channel_id"], item.get("backfill_slice"))
+        with pending_lock:
+            pending_cursors[cursor] = max(pending_cursors.get(cursor, 0), int(item["id"]))
+
+    metrics.incr("messages", count)
     print(f"   📤 Batch envoyé à Redpanda ({count} items) -> Topic: {KAFKA_TOPIC}")
 
+    with pending_lock:
+        pending_count += count
+        due = pending_count >= BACKFILL_CHECKPOINT_EVERY
+    if due:
+        checkpoint()
+
+def cursor_key(channel_id, slice_index=None) -> str:
+    """Un curseur par salon, ou par tranche temporelle pour les salons découpés."""
+    return str(channel_id) if slice_index is None else f"{channel_id}@{slice_index}"
+
+def checkpoint():
+    """
+    Frontière de checkpoint : on attend la livraison de tout ce qui a été envoyé,
+    puis on avance le high-water mark (snowflake) de chaque salon/tranche concerné.
+    Si des messages ont échoué, producer.flush() lève et les curseurs ne bougent pas.
+    """
+    global pending_count
+    with checkpoint_lock:
+        # Snapshot AVANT le flush : un curseur n'est enregistré qu'après son send(), donc tout le
+        # snapshot est couvert par le flush. Les curseurs ajoutés pendant le flush par d'autres
+        # threads de load attendent le checkpoint suivant.
+        with pending_lock:
+            latest = dict(pending_cursors)
+            pending_cursors.clear()
+            pending_count = 0
+        producer.flush()
+        persist_cursors(latest)
+
+def persist_cursors(latest):
+    """N'avance que les curseurs en retard sur l'état persisté (jamais de retour en arrière)."""
+    updates = {}
+    for key, last_id in latest.items():
+        cursor = checkpoints.get(key, {})
+        if last_id > cursor.get("last_id", 0):
+            updates[key] = {"last_id": last_id}
+    if updates:
+        with metrics.timer("checkpoint"):
+            checkpoints.set_many(updates)
+        print(f"   💾 Checkpoint : {len(updates)} curseurs avancés")
+
 
 # --- EXTRACTION (SOURCE) ---
-def serialize_message(msg: discord.Message) -> Dict[str, Any]:
+def serialize_message(msg: discord.Message, slice_index=None) -> Dict[str, Any]:
+    # L'ordre stable est donné par `id` (snowflake = horodatage) : les tranches lues
+    # en parallèle arrivent mélangées mais se retriment sur (channel_id, id)
     return {
         "id": str(msg.id),
         "channel_id": str(msg.channel.id),
@@ -94,48 +171,200 @@ def serialize_message(msg: discord.Message) -> Dict[str, Any]:
             {"emoji": str(r.emoji), "count": r.count} for r in msg.reactions
         ],
         "mentions": [str(u.id) for u in msg.mentions],
+        "backfill_slice": slice_index,
         "source": "backfill-dlt"
     }
 
-async def fetch_discord_messages(guild_id: int, start: datetime, end: datetime):
+async def estimate_message_count(channel, start: datetime, end: datetime) -> int:
+    """
+    Sonde de densité bon marché : 1 appel API (100 derniers messages de la fenêtre),
+    extrapolé à toute la fenêtre d'après leur étalement dans le temps.
+    """
+    recent = [m async for m in channel.history(limit=100, after=start, before=end, oldest_first=False)]
+    if len(recent) < 100:
+        return len(recent)
+    window_start = start or discord.utils.snowflake_time(channel.id)
+    window_end = end or datetime.now(timezone.utc)
+    span = max((recent[0].created_at - recent[-1].created_at).total_seconds(), 1.0)
+    return int(100 * (window_end - window_start).total_seconds() / span)
+
+async def plan_channel(channel, start: datetime, end: datetime, cursors: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Découpe un salon en tranches [after, before) de snowflakes. Le plan est persisté au
+    premier passage pour que les curseurs des tranches restent valides d'un round à l'autre.
+    """
+    channel_id = str(channel.id)
+    plan = cursors.get(f"plan:{channel_id}")
+    if plan is None:
+        plan = {"slices": None}
+        # Un salon déjà entamé sans découpage continue sur son curseur unique
+        if channel_id not in cursors:
+            estimate = await estimate_message_count(channel, start, end)
+            n_slices = min(BACKFILL_MAX_SLICES, -(-estimate // BACKFILL_SLICE_SIZE))
+            if n_slices > 1:
+                window_start = start or discord.utils.snowflake_time(channel.id)
+                window_end = end or datetime.now(timezone.utc)
+                step = (window_end - window_start) / n_slices
+                bounds = [discord.utils.time_snowflake(window_start + step * i) for i in range(n_slices)]
+                # La dernière tranche reste ouverte si la fenêtre l'est (mode incrémental ensuite)
+                ends = bounds[1:] + [discord.utils.time_snowflake(end) if end else None]
+                plan = {"slices": [[a, b] for a, b in zip(bounds, ends)]}
+                print(f"  ✂️  #{channel.name}: ~{estimate} messages -> {n_slices} tranches")
+        checkpoints.set(f"plan:{channel_id}", plan)
+
+    if not plan["slices"]:
+        return [{"channel": channel, "slice": None, "after": start, "before": end}]
+    return [
+        {"channel": channel, "slice": i, "after": discord.Object(id=a), "before": discord.Object(id=b) if b else None}
+        for i, (a, b) in enumerate(plan["slices"])
+    ]
+
+def task_label(task: Dict[str, Any]) -> str:
+    name = task["channel"].name
+    return name if task["slice"] is None else f"{name}[{task['slice']}]"
+
+async def fetch_channel_history(task: Dict[str, Any], queue: asyncio.Queue, stats: Dict[str, Any],
+                                cursors: Dict[str, Any], budget: Dict[str, int]):
+    """Lit l'historique d'un salon ou d'une tranche (depuis son curseur) et pousse les messages dans la file commune."""
+    channel, slice_index = task["channel"], task["slice"]
+    label = task_label(task)
+    cursor = cursors.get(cursor_key(channel.id, slice_index))
+    # Reprise / incrémental : on repart du dernier message livré s'il est dans la fenêtre
+    after = task["after"]
+    if cursor:
+        lower = after.id if isinstance(after, discord.Object) else (discord.utils.time_snowflake(after) if after else 0)
+        if cursor["last_id"] >= lower:
+            after = discord.Object(id=cursor["last_id"])
+    print(f"  👉 Lecture de #{label}{' (reprise)' if cursor else ''}...")
+    started = time.monotonic()
+    count = 0
+    status = "ok"
+    try:
+        # "fetch" = lecture Discord complète du salon ; "bridge_wait" = temps bloqué parce que
+        # DLT/Kafka ne consomment pas assez vite (si elle domine, le goulot est en aval)
+        with metrics.timer("fetch"):
+            async for message in channel.history(after=after, before=task["before"], limit=None, oldest_first=True):
+                count += 1
+                record = serialize_message(message, slice_index)
+                with metrics.timer("bridge_wait"):
+                    await queue.put(record)
+                budget["left"] -= 1
+                if budget["left"] <= 0:
+                    # Round plein : la suite au prochain round, depuis le curseur
+                    status = "paused"
+                    break
+        print(f"     ✅ Total #{label}: {count} messages")
+    except discord.Forbidden:
+        status = "forbidden"
+        print(f"  ❌ Accès interdit à #{label}")
+    except Exception as e:
+        status = "error"
+        print(f"  ❌ Erreur #{label}: {e}")
+    stats[label] = {"count": count, "seconds": time.monotonic() - started, "status": status}
+
+def print_channel_summary(stats: Dict[str, Any]):
+    print("📊 Résumé par salon :")
+    for name, st in sorted(stats.items(), key=lambda kv: -kv[1]["count"]):
+        rate = st["count"] / st["seconds"] if st["seconds"] > 0 else 0
+        print(f"   #{name:<30} {st['count']:>8} msgs  {st['seconds']:>7.1f}s  {rate:>7.1f} msg/s  [{st['status']}]")
+    total = sum(st["count"] for st in stats.values())
+    print(f"   Total : {total} messages sur {len(stats)} salons")
+
+async def fetch_discord_messages(guild_id: int, start: datetime, end: datetime,
+                                 cursors: Dict[str, Any], progress: Dict[str, Any]):
+    # Un client par round : on ne réutilise pas une session fermée
+    intents = discord.Intents.default()
+    intents.message_content = True
+    client = discord.Client(intents=intents)
+
     await client.login(DISCORD_TOKEN)
+    workers = []
     try:
         guild = await client.fetch_guild(guild_id)
         print(f"✅ Connecté au serveur : {guild.name}")
         channels = await guild.fetch_channels()
         text_channels = [c for c in channels if isinstance(c, discord.TextChannel)]
         
-        print(f"🔍 Scan de {len(text_channels)} salons...")
-        
-        for channel in text_channels:
-            print(f"  👉 Lecture de #{channel.name}...")
-            count = 0
+        print(f"🔍 Scan de {len(text_channels)} salons ({BACKFILL_CONCURRENCY} en parallèle)...")
+
+        # Les salons alimentent une file bornée que le générateur vide pour DLT
+        queue = asyncio.Queue(maxsize=1000)
+        semaphore = asyncio.Semaphore(BACKFILL_CONCURRENCY)
+        stats: Dict[str, Any] = {}
+        done = object()
+        # Erreur qui a interrompu run_all : relevée côté consommateur au lieu d'attendre indéfiniment
+        failure: List[BaseException] = []
+
+        budget = {"left": BACKFILL_ROUND_SIZE}
+
+        async def worker(task):
+            async with semaphore:
+                if budget["left"] <= 0:
+                    stats[task_label(task)] = {"count": 0, "seconds": 0.0, "status": "paused"}
+                    return
+                await fetch_channel_history(task, queue, stats, cursors, budget)
+
+        async def plan(channel):
+            async with semaphore:
+                try:
+                    return await plan_channel(channel, start, end, cursors)
+                except Exception as e:
+                    # Sonde impossible (accès interdit, 404/500, timeout, store) : lecture simple,
+                    # qui remontera l'erreur éventuelle dans les stats du salon
+                    if not isinstance(e, discord.Forbidden):
+                        print(f"  ⚠️  Découpage de #{channel.name} impossible ({e}), lecture sans tranches")
+                    return [{"channel": channel, "slice": None, "after": start, "before": end}]
+
+        async def run_all():
             try:
-                async for message in channel.history(after=start, before=end, limit=None):
-                    count += 1
-                    yield serialize_message(message)
-                print(f"     ✅ Total #{channel.name}: {count} messages")
-            except discord.Forbidden:
-                print(f"  ❌ Accès interdit à #{channel.name}")
+                # Les tranches d'un gros salon deviennent des tâches comme les autres
+                plans = await asyncio.gather(*(plan(c) for c in text_channels))
+                await asyncio.gather(*(worker(t) for tasks in plans for t in tasks))
             except Exception as e:
-                print(f"  ❌ Erreur #{channel.name}: {e}")
+                failure.append(e)
+            finally:
+                # Annulé par le consommateur (qui ne lit plus la file) : pas de sentinelle
+                if not asyncio.current_task().cancelling():
+                    await queue.put(done)
+
+        workers.append(asyncio.create_task(run_all()))
+
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            yield item
+
+        if failure:
+            raise failure[0]
+
+        print_channel_summary(stats)
+        progress["exhausted"] = all(st["status"] != "paused" for st in stats.values())
     finally:
+        for task in workers:
+            task.cancel()
         await client.close()
 
 @dlt.resource(name="discord_messages", write_disposition="append")
-def discord_source():
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    generator = fetch_discord_messages(GUILD_ID, START_DATE, END_DATE)
-    try:
-        while True:
-            yield loop.run_until_complete(generator.__anext__())
-    except StopAsyncIteration:
-        pass
-    finally:
-        loop.close()
+def discord_source(cursors: Dict[str, Any], progress: Dict[str, Any]):
+    # Le fetch Discord tourne sur sa propre boucle (thread dédié) et remplit une file bornée ;
+    # l'extraction DLT (staging sur disque) consomme par pages de 100 messages pendant que les
+    # requêtes suivantes partent. La sérialisation et l'envoi Kafka (kafka_destination) ne
+    # démarrent qu'au load, une fois tout le round extrait : ils ne chevauchent pas le fetch.
+    yield from iter_async_chunks(
+        lambda: fetch_discord_messages(GUILD_ID, START_DATE, END_DATE, cursors, progress),
+        chunk_size=100,
+        max_chunks=BRIDGE_MAX_PAGES
+    )
 
 if __name__ == "__main__":
+    profiling.install("discord_backfill")
+
+    GUILD_ID = check_config()
+    checkpoints = StateStore(f"discord_backfill_{GUILD_ID}")
+    if not checkpoints.url:
+        print("⚠️  Curseurs en sqlite local (DB_URL absent) : pas de reprise d'un conteneur à l'autre")
+
     # Pipeline
     pipeline = dlt.pipeline(
         pipeline_name="discord_to_kafka",
@@ -144,12 +373,28 @@ if __name__ == "__main__":
         destination=kafka_destination 
     )
 
-    print(f"🚀 Démarrage Backfill -> Redpanda ({KAFKA_BROKERS})")
-    
-    # On lance !
-    # Note: On peut désactiver le "state" full si on veut juste streamer, 
-    # mais DLT va quand même tracker ce qu'il a chargé.
-    info = pipeline.run(discord_source())
+    if BACKFILL_RESET:
+        checkpoints.clear()
+
+    print(f"🚀 Démarrage Backfill -> Redpanda ({producer.KAFKA_BROKERS})")
+    print(f"📅 Fenêtre : {START_DATE.isoformat() if START_DATE else 'début'} -> {END_DATE.isoformat() if END_DATE else 'maintenant'}")
     
-    print(info)
+    # On lance par rounds : chaque round repart des curseurs commités par le précédent
+    round_number = 0
+    while True:
+        round_number += 1
+        cursors = dict(checkpoints.items())
+        progress = {"exhausted": True}
+        print(f"🔁 Round {round_number} ({len(cursors)} salons avec curseur)")
+        with metrics.timer("pipeline"):
+            info = pipeline.run(discord_source(cursors, progress))
+        checkpoint()
+        print(info)
+        if progress["exhausted"]:
+            break
+
+    producer.close()
+    print(producer.delivery_summary())
+    print(metrics.summary())
+    metrics.export("discord_backfill")
     print("✅ Terminé !")
\ No newline at end of file
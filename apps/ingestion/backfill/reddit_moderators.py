@@ -1,26 +1,14 @@
 import os
-import requests
+import sys
 import json
-import base64
+import asyncio
 import psycopg2
-from psycopg2.extras import Json
+from psycopg2.extras import Json, execute_values
+from lovelace import metrics, profiling
+from lovelace.zyte import decode_body, run_sync
 
-def sync_moderators():
-    # 1. Config & Secrets
-    subreddit = os.getenv("SUBREDDIT")
-    game_id = os.getenv("GAME_ID")
-    db_url = os.getenv("DB_URL")
-    
-    zyte_api_key = os.getenv("ZYTE_API_KEY")
-    reddit_session = os.getenv("REDDIT_SESSION") # La valeur brute du cookie
-
-    if not all([subreddit, game_id, db_url, zyte_api_key, reddit_session]):
-        raise ValueError("Missing required env vars: SUBREDDIT, GAME_ID, DB_URL, ZYTE_API_KEY, REDDIT_SESSION")
-
-    print(f"🚀 Ingestion Lovelace : Extraction de r/{subreddit} via Zyte API...")
-
-    # 2. Appel API Zyte (Exactement comme ton script test)
-    api_url = "https://api.zyte.com/v1/extract"
+async def fetch_moderators(client, subreddit, reddit_session):
+    """Récupère la liste brute des modérateurs d'un subreddit via Zyte (cookie de session requis)."""
     target_url = f"https://www.reddit.com/r/{subreddit}/about/moderators.json"
 
     payload = {
@@ -35,15 +23,105 @@ def sync_moderators():
         ]
     }
 
-    try:
-        r = requests.post(api_url, auth=(zyte_api_key, ""), json=payload, timeout=60)
-        r.raise_for_status()
-        
-        res_json = r.json()
-        raw_body = base64.b64decode(res_json["httpResponseBody"]).decode("utf-8")
+    res_json = await client.extract(payload, timeout=60)
+    raw_body = decode_body(res_json).decode("utf-8")
+    with metrics.timer("parse"):
         reddit_data = json.loads(raw_body)
-        
-        moderators = reddit_data.get("data", {}).get("children", [])
+    return reddit_data.get("data", {}).get("children", [])
+
+async def fetch_all_moderators(client, pairs, reddit_session):
+    """Toutes les équipes de modération en parallèle (le client borne les requêtes en vol)."""
+    return await asyncio.gather(
+        *(fetch_moderators(client, subreddit, reddit_session) for _, _, subreddit in pairs),
+        return_exceptions=True
+    )
+
+def role_of(mod):
+    """Rôle Reddit d'un modérateur : son flair, ou Admin par défaut."""
+    role_name = mod.get("author_flair_text") or "Admin"
+    return f"reddit_role_{role_name.lower()}", role_name
+
+def upsert_moderators(cur, game_platform_id, moderators):
+    """
+    Upsert ensembliste : rôles, membres puis liaisons, en trois requêtes quelle que soit
+    la taille de l'équipe de modération (au lieu de 3 allers-retours par modérateur).
+    """
+    if not moderators:
+        return
+
+    # Rôles et membres dédupliqués côté Python (un ON CONFLICT ne peut toucher deux fois la même ligne)
+    roles = {}
+    members = {}
+    links = set()
+    for mod in moderators:
+        # mod est ici un dict direct du JSON Reddit : { name, id, author_flair_text, ... }
+        role_external_id, role_name = role_of(mod)
+        roles[role_external_id] = (
+            game_platform_id, role_external_id, role_name,
+            Json({"mod_permissions": mod.get("mod_permissions", [])})
+        )
+        members[mod["id"]] = (
+            game_platform_id, mod["id"], mod["name"], mod["name"],
+            Json(mod) # JSON brut complet dans metadata
+        )
+        links.add((mod["id"], role_external_id))
+
+    with metrics.timer("db_write"):
+        # 1. Upsert Roles
+        role_ids = dict(execute_values(cur, """
+            INSERT INTO platform_roles (
+                id, game_platform_id, external_id, name, permissions, updated_at
+            ) VALUES %s
+            ON CONFLICT (game_platform_id, external_id) 
+            DO UPDATE SET 
+                permissions = EXCLUDED.permissions,
+                updated_at = NOW()
+            RETURNING external_id, id
+        """, list(roles.values()),
+            template="(gen_random_uuid(), %s, %s, %s, %s, NOW())", page_size=len(roles), fetch=True))
+
+        # 2. Upsert Members
+        member_ids = dict(execute_values(cur, """
+            INSERT INTO platform_members (
+                id, game_platform_id, external_id, username, display_name, metadata, updated_at
+            ) VALUES %s
+            ON CONFLICT (game_platform_id, external_id) 
+            DO UPDATE SET 
+                username = EXCLUDED.username,
+                metadata = platform_members.metadata || EXCLUDED.metadata,
+                updated_at = NOW()
+            RETURNING external_id, id
+        """, list(members.values()),
+            template="(gen_random_uuid(), %s, %s, %s, %s, %s, NOW())", page_size=len(members), fetch=True))
+
+        # 3. Liaisons Membre <-> Rôle
+        execute_values(cur, """
+            INSERT INTO platform_member_roles (member_id, role_id)
+            VALUES %s
+            ON CONFLICT (member_id, role_id) DO NOTHING
+        """, [(member_ids[user_id], role_ids[role_external_id]) for user_id, role_external_id in links],
+            page_size=len(links))
+
+    metrics.incr("moderators", len(moderators))
+    print(f"💾 {len(members)} members, {len(roles)} roles upserted")
+
+def sync_moderators():
+    # 1. Config & Secrets
+    subreddit = os.getenv("SUBREDDIT")
+    game_id = os.getenv("GAME_ID")
+    db_url = os.getenv("DB_URL")
+    
+    zyte_api_key = os.getenv("ZYTE_API_KEY")
+    reddit_session = os.getenv("REDDIT_SESSION") # La valeur brute du cookie
+
+    if not all([subreddit, game_id, db_url, zyte_api_key, reddit_session]):
+        raise ValueError("Missing required env vars: SUBREDDIT, GAME_ID, DB_URL, ZYTE_API_KEY, REDDIT_SESSION")
+
+    print(f"🚀 Ingestion Lovelace : Extraction de r/{subreddit} via Zyte API...")
+
+    # 2. Appel API Zyte (client partagé)
+    try:
+        moderators = run_sync(fetch_moderators, subreddit, reddit_session, api_key=zyte_api_key, timeout=60)
         print(f"📦 Found {len(moderators)} moderators via Zyte")
 
     except Exception as e:
@@ -70,65 +148,11 @@ def sync_moderators():
         
         game_platform_id = row[0]
 
-        for mod in moderators:
-            # mod est ici un dict direct du JSON Reddit : { name, id, author_flair_text, ... }
-            username = mod["name"]
-            user_id = mod["id"] # t2_...
-            flair = mod.get("author_flair_text")
-            
-            role_name = flair if flair else "Admin"
-            role_external_id = f"reddit_role_{role_name.lower()}"
-
-            # 1. Upsert Role
-            cur.execute("""
-                INSERT INTO platform_roles (
-                    id, game_platform_id, external_id, name, permissions, updated_at
-                ) VALUES (
-                    gen_random_uuid(), %s, %s, %s, %s, NOW()
-                )
-                ON CONFLICT (game_platform_id, external_id) 
-                DO UPDATE SET 
-                    permissions = EXCLUDED.permissions,
-                    updated_at = NOW()
-                RETURNING id
-            """, (
-                game_platform_id, 
-                role_external_id, 
-                role_name, 
-                Json({"mod_permissions": mod.get("mod_permissions", [])})
-            ))
-            role_id = cur.fetchone()[0]
-
-            # 2. Upsert Member
-            cur.execute("""
-                INSERT INTO platform_members (
-                    id, game_platform_id, external_id, username, display_name, metadata, updated_at
-                ) VALUES (
-                    gen_random_uuid(), %s, %s, %s, %s, %s, NOW()
-                )
-                ON CONFLICT (game_platform_id, external_id) 
-                DO UPDATE SET 
-                    username = EXCLUDED.username,
-                    metadata = platform_members.metadata || EXCLUDED.metadata,
-                    updated_at = NOW()
-                RETURNING id
-            """, (
-                game_platform_id,
-                user_id,
-                username,
-                username,
-                Json(mod) # JSON brut complet dans metadata
-            ))
-            member_id = cur.fetchone()[0]
-
-            # 3. Liaison Membre <-> Rôle
-            cur.execute("""
-                INSERT INTO platform_member_roles (member_id, role_id)
-                VALUES (%s, %s)
-                ON CONFLICT (member_id, role_id) DO NOTHING
-            """, (member_id, role_id))
-
-        conn.commit()
+        # B. Rôles, membres et liaisons en trois requêtes ensemblistes
+        upsert_moderators(cur, game_platform_id, moderators)
+
+        with metrics.timer("db_write"):
+            conn.commit()
         print("🎉 Sync complete!")
 
     except Exception as e:
@@ -138,5 +162,69 @@ def sync_moderators():
         cur.close()
         conn.close()
 
+def load_reddit_pairs(cur):
+    """Toutes les paires (game_platform_id, game_id, subreddit) à synchroniser, en une requête."""
+    cur.execute("""
+        SELECT gp.id, gp.game_id, gp.config->>'subreddit'
+        FROM game_platforms gp
+        JOIN platforms p ON gp.platform_id = p.id
+        WHERE p.slug = 'reddit' AND COALESCE(gp.config->>'subreddit', '') <> ''
+        ORDER BY gp.game_id
+    """)
+    return cur.fetchall()
+
+def sync_all_moderators():
+    """
+    Rafraîchissement de toute la flotte en un seul job : une requête pour les paires,
+    les fetchs Zyte en parallèle, puis les upserts ensemblistes sur une seule connexion
+    (un commit par subreddit, pour qu'un échec n'annule pas les autres).
+    """
+    db_url = os.getenv("DB_URL")
+    zyte_api_key = os.getenv("ZYTE_API_KEY")
+    reddit_session = os.getenv("REDDIT_SESSION")
+
+    if not all([db_url, zyte_api_key, reddit_session]):
+        raise ValueError("Missing required env vars: DB_URL, ZYTE_API_KEY, REDDIT_SESSION")
+
+    conn = psycopg2.connect(db_url)
+    cur = conn.cursor()
+    failed = []
+
+    try:
+        pairs = load_reddit_pairs(cur)
+        print(f"🚀 Ingestion Lovelace : {len(pairs)} subreddits à synchroniser via Zyte API...")
+
+        results = run_sync(fetch_all_moderators, pairs, reddit_session, api_key=zyte_api_key, timeout=60)
+
+        for (game_platform_id, game_id, subreddit), moderators in zip(pairs, results):
+            if isinstance(moderators, Exception):
+                print(f"❌ r/{subreddit} (game {game_id}): {moderators}")
+                failed.append(subreddit)
+                continue
+            try:
+                upsert_moderators(cur, game_platform_id, moderators)
+                with metrics.timer("db_write"):
+                    conn.commit()
+                print(f"✅ r/{subreddit}: {len(moderators)} moderators")
+            except Exception as e:
+                conn.rollback()
+                print(f"❌ r/{subreddit} (game {game_id}): {e}")
+                failed.append(subreddit)
+    finally:
+        cur.close()
+        conn.close()
+
+    print(f"🎉 Sync complete: {len(pairs) - len(failed)}/{len(pairs)} subreddits")
+    if failed:
+        raise RuntimeError(f"Reddit sync failed for: {', '.join(failed)}")
+
 if __name__ == "__main__":
-    sync_moderators()
+    profiling.install("reddit_moderators")
+    try:
+        if "--all" in sys.argv[1:]:
+            sync_all_moderators()
+        else:
+            sync_moderators()
+    finally:
+        print(metrics.summary())
+        metrics.export("reddit_moderators")
@@ -0,0 +1,128 @@
+"""
+Benchmark du parse CSV de csv_to_clickhouse (pandas vs Arrow) : lignes/s et pic RSS,
+sur un fichier synthétique façon export partenaire. Chaque moteur tourne dans son
+propre processus pour que le pic RSS mesuré soit le sien (parse + transformations,
+sans chargement ClickHouse).
+
+    PYTHONPATH=. python bench/csv_bench.py --rows 10000000
+    PYTHONPATH=. python bench/csv_bench.py --check
+"""
+import os
+import sys
+import json
+import time
+import random
+import resource
+import argparse
+import subprocess
+
+MAPPING = {
+    "Player ID": "player_id",
+    "Event Date": {"name": "event_date", "type": "DateTime"},
+    "Playtime Minutes": {"name": "playtime_minutes", "type": "UInt32"},
+    "Revenue": {"name": "revenue", "type": "Float64"},
+    "Country": {"name": "country", "type": "LowCardinality(String)"},
+    "Platform": "platform"
+}
+
+def generate(path, rows):
+    countries = ["FR", "US", "DE", "JP", "BR", "GB", "KR"]
+    platforms = ["Steam", "Epic", "PS5", "Xbox", "Switch"]
+    with open(path, "w") as f:
+        f.write(",".join(MAPPING) + "\n")
+        for i in range(rows):
+            f.write(
+                f"p{i % 250000},2024-{1 + i % 12:02d}-{1 + i % 28:02d} {i % 24:02d}:{i % 60:02d}:00,"
+                f"{random.randint(0, 600)},{random.random() * 20:.2f},"
+                f"{random.choice(countries)},{random.choice(platforms)}\n"
+            )
+
+def check():
+    """
+    Type qui change après le premier chunk (entiers puis "abc") : la colonne passe en texte au lieu
+    d'arrêter l'import, en flux comme en spill multi-fichiers, avec les valeurs de pd.read_csv.
+    """
+    import io
+    import tempfile
+    import pandas as pd
+    from lovelace import tabular
+
+    rows = tabular.CSV_CHUNK_ROWS + 10
+    data = "id,v\n" + "".join(f"{i},{'abc' if i == rows - 1 else i}\n" for i in range(rows))
+    expected = pd.read_csv(io.StringIO(data))["v"].astype(str).tolist()
+
+    chunks = list(tabular.read_csv_chunks(io.BytesIO(data.encode()), {}, None, {"rows": 0, "chunks": 0}))
+    streamed = [str(v) for chunk in chunks for v in chunk["v"]]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "types.csv")
+        with open(path, "w") as f:
+            f.write(data)
+        tabular.spill_file(path, path + ".arrow", "pandas", {}, None)
+        batches = list(tabular.read_spilled(path + ".arrow"))
+    spilled = [str(v) for batch in batches for v in batch.column("v").to_pylist()]
+
+    failures = 0
+    for name, values in (("flux", streamed), ("spill", spilled)):
+        ok = values == expected
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {name}: {len(values)} lignes, dernière valeur {values[-1]!r}")
+    return failures
+
+def run_engine(engine, path):
+    from lovelace.tabular import parse_mapping, read_csv_arrow, read_csv_chunks
+
+    mapping, types = parse_mapping(json.dumps(MAPPING))
+    stats = {"rows": 0, "chunks": 0}
+    start = time.perf_counter()
+    with open(path, "rb") as body:
+        if engine == "arrow":
+            chunks = read_csv_arrow(body, mapping, "game-1", stats, types)
+        else:
+            chunks = read_csv_chunks(body, mapping, "game-1", stats)
+        for _ in chunks:
+            pass
+    elapsed = time.perf_counter() - start
+    # ru_maxrss est en Kio sous Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {
+        "engine": engine,
+        "rows": stats["rows"],
+        "chunks": stats["chunks"],
+        "seconds": round(elapsed, 2),
+        "rows_per_s": int(stats["rows"] / elapsed) if elapsed else 0,
+        "peak_rss_mb": round(peak_mb, 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--file", default="/tmp/lovelace_csv_bench.csv")
+    parser.add_argument("--engines", default="pandas,arrow")
+    parser.add_argument("--engine", help=argparse.SUPPRESS)
+    parser.add_argument("--check", action="store_true", help="Vérifie l'élargissement de type entre chunks")
+    args = parser.parse_args()
+
+    if args.check:
+        sys.exit(1 if check() else 0)
+
+    if args.engine:
+        # Processus enfant : un seul moteur, résultat JSON sur la dernière ligne
+        print(json.dumps(run_engine(args.engine, args.file)))
+        return
+
+    if not os.path.exists(args.file):
+        print(f"🧪 Génération de {args.rows} lignes dans {args.file}...", file=sys.stderr)
+        generate(args.file, args.rows)
+
+    results = []
+    for engine in args.engines.split(","):
+        proc = subprocess.run(
+            [sys.executable, __file__, "--file", args.file, "--engine", engine],
+            capture_output=True, text=True, check=True
+        )
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Équivalence et temps de parse des extracteurs de scores : parsel (référence) vs
+selectolax (fast path) vs extract() (scan des marqueurs + fast path + repli parsel),
+sur les fixtures de bench/fixtures/html.
+
+    PYTHONPATH=. python bench/html_bench.py --check
+    PYTHONPATH=. python bench/html_bench.py --pad-kb 800 --repeat 200
+
+--pad-kb ajoute du balisage de remplissage avant le bloc de scores pour simuler
+les pages réelles (Metacritic et les rendus browserHtml d'OpenCritic font plusieurs centaines de Ko).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "scraping"))
+FIXTURES = os.path.join(ROOT, "bench", "fixtures", "html")
+
+import lovelace.html as fast_html
+from lovelace.html import extract, make_selector
+from metacritic_score import METACRITIC_MARKERS, read_metacritic
+from ign_score import IGN_MARKERS, read_ign_score
+from opencritic_score import OPENCRITIC_MARKERS, get_player_data, read_player_orb
+
+# site -> (fonction de lecture brute, marqueurs, fonction finale du script)
+SITES = {
+    "metacritic": (read_metacritic, METACRITIC_MARKERS,
+                   lambda html: extract(html, read_metacritic, markers=METACRITIC_MARKERS)),
+    "ign": (read_ign_score, IGN_MARKERS,
+            lambda html: extract(html, read_ign_score, markers=IGN_MARKERS)),
+    "opencritic": (read_player_orb, OPENCRITIC_MARKERS, get_player_data),
+}
+
+def load_fixtures(pad_kb=0):
+    filler = '<div class="c-filler"><a href="/game/x/">Related game</a><span> 7.1 </span></div>\n'
+    padding = filler * (pad_kb * 1024 // len(filler)) if pad_kb else ""
+    fixtures = []
+    for name in sorted(os.listdir(FIXTURES)):
+        site = name.split("_", 1)[0]
+        with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+            html = f.read()
+        fixtures.append((site, name, html.replace("<body>", "<body>" + padding, 1)))
+    return fixtures
+
+def with_engine(fast, fn, html):
+    previous = fast_html.FAST_HTML
+    fast_html.FAST_HTML = fast
+    try:
+        return fn(html)
+    finally:
+        fast_html.FAST_HTML = previous
+
+def check(fixtures):
+    """Le fast path seul puis la fonction finale du script doivent donner exactement le résultat parsel."""
+    failures = 0
+    for site, name, html in fixtures:
+        read, _, final = SITES[site]
+        strict = (read(make_selector(html, "parsel")), read(make_selector(html, "fast")))
+        full = (with_engine(False, final, html), with_engine(True, final, html))
+        ok = strict[0] == strict[1] and full[0] == full[1]
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {name}: {json.dumps(full[1], ensure_ascii=False)}")
+        if not ok:
+            print(f"   parsel={strict[0]!r} fast={strict[1]!r} / {full[0]!r} vs {full[1]!r}")
+    return failures
+
+def timeit(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1000
+
+def bench(fixtures, repeat):
+    rows = []
+    for site, name, html in fixtures:
+        read, markers, _ = SITES[site]
+        rows.append({
+            "fixture": name,
+            "kb": len(html) // 1024,
+            "parsel_ms": round(timeit(lambda: read(make_selector(html, "parsel")), repeat), 3),
+            "fast_ms": round(timeit(lambda: read(make_selector(html, "fast")), repeat), 3),
+            "extract_ms": round(timeit(lambda: extract(html, read, markers=markers), repeat), 3),
+        })
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--check", action="store_true", help="Équivalence uniquement")
+    parser.add_argument("--pad-kb", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    if fast_html.LexborHTMLParser is None:
+        sys.exit("❌ selectolax n'est pas installé : rien à comparer")
+
+    fixtures = load_fixtures(args.pad_kb)
+    failures = check(fixtures)
+    if args.check:
+        sys.exit(1 if failures else 0)
+
+    rows = bench(fixtures, args.repeat)
+    for site in SITES:
+        site_rows = [r for r in rows if r["fixture"].startswith(site)]
+        parsel_ms = sum(r["parsel_ms"] for r in site_rows)
+        extract_ms = sum(r["extract_ms"] for r in site_rows)
+        print(f"📊 {site}: parsel {parsel_ms:.2f} ms, extract {extract_ms:.2f} ms "
+              f"(x{parsel_ms / extract_ms if extract_ms else 0:.1f}) sur {len(site_rows)} fixtures")
+    print(json.dumps(rows, indent=2))
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Temps de démarrage à froid par job : chaque script de lovelace.jobs est chargé (sans exécuter
+son __main__) dans un interpréteur neuf sous `python -X importtime`.
+
+    PYTHONPATH=. python bench/importtime_bench.py
+    PYTHONPATH=. python bench/importtime_bench.py --jobs ign,csv --top 15
+    PYTHONPATH=. python bench/importtime_bench.py --json-out /tmp/importtime.json
+    PYTHONPATH=. python bench/importtime_bench.py --baseline /tmp/importtime.json --tolerance 0.2
+
+Rapport par job : temps d'import total (hors modules de l'interpréteur nu), médiane du
+temps mur sur --runs lancements, et les paquets les plus coûteux (temps propre de leurs
+modules, quel que soit l'importeur). Les imports différés dans les fonctions (dlt/boto3 du CSV,
+kafka au premier envoi) ne sont pas comptés : c'est le coût que paient aussi les workers
+de parse, qui réimportent le script. Avec --baseline,
+sortie en erreur si l'import d'un job ralentit de plus de --tolerance.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from lovelace.jobs import JOBS, script_path
+
+# Le script est exécuté sous un autre nom que __main__ : imports et constantes seulement
+LOAD = "import runpy, sys; runpy.run_path(sys.argv[1], run_name='__importtime__')"
+
+def run(code, *args, importtime=False):
+    env = {**os.environ, "PYTHONPATH": ROOT, "PYTHONDONTWRITEBYTECODE": ""}
+    cmd = [sys.executable, *(["-X", "importtime"] if importtime else []), "-c", code, *args]
+    started = time.perf_counter()
+    proc = subprocess.run(cmd, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if proc.returncode != 0:
+        output = [l for l in (proc.stderr + proc.stdout).splitlines() if l.strip() and not l.startswith("import time:")]
+        raise RuntimeError(output[-1] if output else f"code {proc.returncode}")
+    return elapsed, proc.stderr
+
+def parse_importtime(stderr):
+    """Lignes 'import time: self [us] | cumulative | module' -> [(module, self µs)]."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(self_us)))
+    return modules
+
+def measure(job, startup, runs):
+    """Temps propre de chaque module importé par le job, regroupé par paquet racine."""
+    path = script_path(job)
+    _, stderr = run(LOAD, path, importtime=True)
+    packages = {}
+    for module, us in parse_importtime(stderr):
+        if module not in startup:
+            package = module.split(".")[0]
+            packages[package] = packages.get(package, 0) + us
+    walls = [run(LOAD, path)[0] for _ in range(runs)]
+    return {
+        "import_ms": round(sum(packages.values()) / 1000, 1),
+        "wall_ms": round(statistics.median(walls) * 1000, 1),
+        "packages": {p: round(us / 1000, 1) for p, us in sorted(packages.items(), key=lambda kv: -kv[1])}
+    }
+
+def compare(results, baseline, tolerance):
+    """Régressions par rapport à un rapport précédent (--json-out)."""
+    regressions = []
+    for job, current in results.items():
+        before = baseline.get(job)
+        if before and "import_ms" in before and "import_ms" in current and current["import_ms"] > before["import_ms"] * (1 + tolerance):
+            regressions.append(f"{job}: import {before['import_ms']}ms -> {current['import_ms']}ms")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", default=",".join(JOBS))
+    parser.add_argument("--runs", type=int, default=5, help="Lancements pour la médiane du temps mur")
+    parser.add_argument("--top", type=int, default=8, help="Paquets affichés par job")
+    parser.add_argument("--json-out", default=None)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    # Modules déjà chargés par un interpréteur vide (site, encodings...) : hors périmètre des jobs
+    _, stderr = run("pass", importtime=True)
+    startup = {module for module, _ in parse_importtime(stderr)} | {"runpy"}
+    bare = statistics.median(run("pass")[0] for _ in range(args.runs))
+    print(f"🐍 Interpréteur seul : {bare * 1000:.0f}ms", file=sys.stderr)
+
+    results = {}
+    for job in args.jobs.split(","):
+        try:
+            results[job] = r = measure(job, startup, args.runs)
+        except RuntimeError as e:
+            # Dépendance absente de l'environnement local : on le signale sans arrêter le bench
+            results[job] = {"error": str(e)}
+            print(f"⚠️  {job}: {e}", file=sys.stderr)
+            continue
+        heaviest = ", ".join(f"{p} {ms:.0f}ms" for p, ms in list(r["packages"].items())[:args.top])
+        print(f"📦 {job}: import {r['import_ms']:.0f}ms, démarrage {r['wall_ms']:.0f}ms | {heaviest}", file=sys.stderr)
+
+    print(json.dumps(results, indent=2))
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"❌ Régression {line}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Pushgateway minimale pour les runs locaux : garde le dernier push de chaque job
+(PUT/POST /metrics/job/<job>) et les ré-expose sur GET /metrics.
+
+    python bench/pushgateway_stub.py --port 9091
+    LOVELACE_PUSHGATEWAY=http://127.0.0.1:9091 python scraping/ign_score.py elden-ring
+"""
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_pushes = {}
+_lock = threading.Lock()
+
+class PushHandler(BaseHTTPRequestHandler):
+    def do_PUT(self):
+        parts = self.path.strip("/").split("/")
+        if len(parts) < 3 or parts[:2] != ["metrics", "job"]:
+            self.send_error(404)
+            return
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8")
+        with _lock:
+            _pushes["/".join(parts[2:])] = body
+        print(f"📥 push {parts[2]} ({body.count(chr(10))} lignes)", flush=True)
+        self.send_response(202)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    do_POST = do_PUT
+
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        with _lock:
+            body = "".join(_pushes.values()).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        pass
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=9091)
+    args = parser.parse_args()
+    print(f"🧪 Pushgateway stub sur http://127.0.0.1:{args.port}")
+    ThreadingHTTPServer(("127.0.0.1", args.port), PushHandler).serve_forever()
@@ -0,0 +1,178 @@
+"""
+Benchmark hors ligne des scrapers : chaque scrape_*_async tourne à l'échelle contre le
+stub Zyte (bench/zyte_stub.py --fixtures), qui rejoue les pages enregistrées avec
+latence, erreurs et 429 configurables. Aucun crédit Zyte, aucun réseau.
+
+    PYTHONPATH=. python bench/replay_bench.py --items 500 --latency-ms 150 --jitter-ms 50 --rate-429 0.03
+    PYTHONPATH=. python bench/replay_bench.py --sites ign,epic --json-out /tmp/replay.json
+    PYTHONPATH=. python bench/replay_bench.py --baseline /tmp/replay.json --tolerance 0.2
+
+Rapport par site : p50/p95/p99 de latence par item, items/s, CPU par item (processus
+du bench seulement : le stub tourne dans un sous-processus). Avec --baseline, sortie
+en erreur si le débit baisse ou si le p95 monte de plus de --tolerance.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "scraping"))
+
+# État isolé (tiers OpenCritic, sandboxId Epic) et pas de cache disque : chaque item paie ses appels
+os.environ["LOVELACE_STATE_DIR"] = tempfile.mkdtemp(prefix="lovelace-replay-")
+os.environ.pop("ZYTE_CACHE_DIR", None)
+for name in ("LOVELACE_STATE_URL", "DB_URL"):
+    os.environ.pop(name, None)
+
+from lovelace.zyte import ZyteClient, start_item
+from lovelace.ratelimit import RetryPolicy
+
+def load_sites():
+    from metacritic_score import scrape_metacritic_async
+    from ign_score import scrape_ign_score_async
+    from opencritic_score import scrape_opencritic_async
+    from epic_score import scrape_epic_games_async
+
+    # site -> (scrape, générateur de clés) ; des clés uniques pour ne rien mémoriser d'un item à l'autre
+    return {
+        "metacritic": (scrape_metacritic_async, lambda i: f"game-{i}"),
+        "ign": (scrape_ign_score_async, lambda i: f"game-{i}"),
+        "opencritic": (scrape_opencritic_async, lambda i: 10000 + i),
+        "epic": (scrape_epic_games_async, lambda i: f"game-{i}"),
+    }
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_stub(args):
+    port = free_port()
+    cmd = [
+        sys.executable, os.path.join(ROOT, "bench", "zyte_stub.py"),
+        "--port", str(port), "--fixtures", os.path.join(ROOT, "bench", "fixtures"),
+        "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+        "--error-rate", str(args.error_rate), "--rate-429", str(args.rate_429),
+        "--retry-after", str(args.retry_after), "--seed", str(args.seed)
+    ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return proc, f"http://127.0.0.1:{port}/v1/extract"
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    sys.exit("❌ Le stub Zyte n'a pas démarré")
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+async def run_site(scrape_fn, make_key, items, api_url, args):
+    latencies = []
+    errors = 0
+    # Autant d'items en cours que de slots client : la latence mesurée est celle d'un item, pas de la file
+    slots = asyncio.Semaphore(args.concurrency)
+
+    async def one(client, key):
+        nonlocal errors
+        async with slots:
+            start_item()
+            started = time.perf_counter()
+            result = await scrape_fn(client, key)
+            latencies.append((time.perf_counter() - started) * 1000)
+        if not isinstance(result, dict) or result.get("error"):
+            errors += 1
+
+    client = ZyteClient(
+        api_key="replay", api_url=api_url, max_in_flight=args.concurrency,
+        rate_limit=args.rate_limit, cache=False,
+        retry_policy=RetryPolicy(max_retry_time=args.max_retry_time, base_delay=args.retry_after)
+    )
+    async with client:
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        await asyncio.gather(*(one(client, make_key(i)) for i in range(items)))
+        cpu, wall = time.process_time() - cpu_start, time.perf_counter() - wall_start
+
+    return {
+        "items": items,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "items_per_s": round(items / wall, 1),
+        "cpu_ms_per_item": round(cpu / items * 1000, 3),
+        "zyte_requests": client.stats["requests"],
+        "zyte_retries": client.stats["retries"],
+    }
+
+def compare(results, baseline, tolerance):
+    """Régressions par rapport à un rapport précédent (--json-out)."""
+    regressions = []
+    for site, current in results.items():
+        before = baseline.get(site)
+        if not before:
+            continue
+        if current["items_per_s"] < before["items_per_s"] * (1 - tolerance):
+            regressions.append(f"{site}: items/s {before['items_per_s']} -> {current['items_per_s']}")
+        if current["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{site}: p95 {before['p95_ms']}ms -> {current['p95_ms']}ms")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sites", default="metacritic,ign,opencritic,epic")
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16, help="max_in_flight du client")
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--jitter-ms", type=float, default=30)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=0.2)
+    parser.add_argument("--max-retry-time", type=float, default=30)
+    parser.add_argument("--rate-limit", type=float, default=1_000_000, help="Budget requêtes/min du client")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json-out", default=None)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    sites = load_sites()
+    proc, api_url = start_stub(args)
+    results = {}
+    try:
+        for site in args.sites.split(","):
+            scrape_fn, make_key = sites[site]
+            results[site] = asyncio.run(run_site(scrape_fn, make_key, args.items, api_url, args))
+            r = results[site]
+            print(f"📊 {site}: {r['items_per_s']} items/s, p50 {r['p50_ms']}ms, p95 {r['p95_ms']}ms, "
+                  f"p99 {r['p99_ms']}ms, CPU {r['cpu_ms_per_item']}ms/item, {r['errors']} erreurs", file=sys.stderr)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    print(json.dumps(results, indent=2))
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"❌ Régression {line}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Micro-benchmark des sérialiseurs Kafka (octets/message, messages/s) sur des payloads
+synthétiques proches de `ingestion-discord` et `ingestion_channels`.
+
+    PYTHONPATH=. python bench/serializers_bench.py --count 50000
+"""
+import time
+import random
+import argparse
+from datetime import datetime, timedelta, timezone
+from lovelace.serializers import get_serializer
+
+def fake_message(i):
+    created = datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=i * 17)
+    return {
+        "id": str(1100000000000000000 + i),
+        "channel_id": "1010101010101010101",
+        "channel_name": "general",
+        "guild_id": "999999999999999999",
+        "author": {
+            "id": str(200000000000000000 + i % 500),
+            "name": f"user{i % 500}",
+            "discriminator": "0",
+            "bot": i % 50 == 0,
+            "display_name": f"User {i % 500}"
+        },
+        "content": "gg " * random.randint(1, 40),
+        "created_at": created,
+        "edited_at": created + timedelta(minutes=2) if i % 10 == 0 else None,
+        "attachments": [
+            {"id": str(300000000000000000 + i), "url": f"https://cdn.discordapp.com/attachments/{i}.png",
+             "filename": f"{i}.png", "content_type": "image/png"}
+        ] if i % 7 == 0 else [],
+        "embeds": [{"type": "rich", "title": "Patch notes", "description": "x" * 120}] if i % 13 == 0 else [],
+        "reactions": [{"emoji": "🔥", "count": i % 9}] if i % 3 == 0 else [],
+        "mentions": [str(200000000000000000 + (i + 1) % 500)] if i % 4 == 0 else [],
+        "backfill_slice": None,
+        "source": "backfill-dlt"
+    }
+
+def fake_channel(i):
+    return {
+        "platform": "discord",
+        "type": "channel",
+        "gameId": "5f0c1b9e-0000-4000-8000-000000000000",
+        "stepSlug": "discord-sync-channels",
+        "workflowId": "onboarding-123",
+        "data": {
+            "id": str(1010101010101010101 + i),
+            "name": f"channel-{i}",
+            "type": 0,
+            "parent_id": None,
+            "position": i,
+            "nsfw": False,
+            "topic": "Discussions générales" if i % 2 else None
+        }
+    }
+
+def bench(topic, payloads, names):
+    print(f"\n== {topic} ({len(payloads)} messages)")
+    print(f"{'sérialiseur':<10} {'octets/msg':>11} {'msgs/s':>12}")
+    for name in names:
+        try:
+            serialize = get_serializer(topic, name)
+        except ImportError as e:
+            print(f"{name:<10} indisponible ({e})")
+            continue
+        started = time.perf_counter()
+        total = sum(len(serialize(p)) for p in payloads)
+        elapsed = time.perf_counter() - started
+        print(f"{name:<10} {total / len(payloads):>11.1f} {len(payloads) / elapsed:>12.0f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=20000)
+    parser.add_argument("--serializers", default="json,orjson,avro")
+    args = parser.parse_args()
+
+    random.seed(42)
+    names = args.serializers.split(",")
+    bench("ingestion-discord", [fake_message(i) for i in range(args.count)], names)
+    bench("ingestion_channels", [fake_channel(i) for i in range(args.count)], names)
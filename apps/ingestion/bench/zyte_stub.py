@@ -0,0 +1,131 @@
+"""
+Faux serveur /v1/extract pour tester le client Zyte sans crédits.
+
+    python bench/zyte_stub.py --port 8765 --script 429,429,503,200 --retry-after 1
+    ZYTE_API_URL=http://127.0.0.1:8765/v1/extract ZYTE_API_KEY=x python scraping/ign_score.py elden-ring
+
+Le script de statuts est rejoué en boucle, une entrée par requête reçue.
+
+Mode rejeu (bench/replay_bench.py) : --fixtures sert les pages enregistrées selon l'URL
+demandée (bench/fixtures/zyte/routes.json), avec latence, erreurs et 429 aléatoires :
+
+    python bench/zyte_stub.py --fixtures bench/fixtures --latency-ms 300 --jitter-ms 100 --error-rate 0.02 --rate-429 0.05
+"""
+import re
+import json
+import time
+import base64
+import random
+import argparse
+import itertools
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_HTML = "<html><body><figure data-cy='review-score'><figcaption>9/10</figcaption></figure></body></html>"
+
+def load_routes(fixtures_dir):
+    """routes.json : [{match (regex sur l'URL), browser (optionnel), file}], premier match gagnant."""
+    base = Path(fixtures_dir)
+    routes = json.loads((base / "zyte" / "routes.json").read_text(encoding="utf-8"))
+    return [
+        (re.compile(r["match"]), r.get("browser"), (base / r["file"]).read_text(encoding="utf-8"))
+        for r in routes
+    ]
+
+def find_fixture(routes, payload):
+    browser = bool(payload.get("browserHtml"))
+    for pattern, route_browser, content in routes:
+        if pattern.search(payload.get("url", "")) and route_browser in (None, browser):
+            return content
+    return None
+
+def make_handler(script, retry_after, html, routes=None, latency=0.0, jitter=0.0,
+                 error_rate=0.0, rate_429=0.0, seed=None):
+    statuses = itertools.cycle(script)
+    lock = threading.Lock()
+    rng = random.Random(seed)
+
+    def draw():
+        # Un seul tirage sous verrou : statut scripté puis aléas (429, 5xx) et latence
+        with lock:
+            status = next(statuses)
+            roll = rng.random()
+            delay = max(0.0, latency + rng.uniform(-jitter, jitter))
+        if status < 400:
+            if roll < rate_429:
+                status = 429
+            elif roll < rate_429 + error_rate:
+                status = 503
+        return status, delay
+
+    class ZyteStubHandler(BaseHTTPRequestHandler):
+        # Keep-alive comme l'API réelle (sinon une connexion TCP par requête fausse les latences)
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            status, delay = draw()
+            if delay:
+                time.sleep(delay)
+
+            content = find_fixture(routes, payload) if routes else html
+            if status < 400 and content is None:
+                status = 404
+
+            if status >= 400:
+                body = json.dumps({"status": status, "title": "scripted error"}).encode()
+                self.send_response(status)
+                if retry_after is not None:
+                    self.send_header("Retry-After", str(retry_after))
+            else:
+                data = {"url": payload.get("url"), "statusCode": 200}
+                if payload.get("browserHtml"):
+                    data["browserHtml"] = content
+                else:
+                    data["httpResponseBody"] = base64.b64encode(content.encode()).decode()
+                body = json.dumps(data).encode()
+                self.send_response(200)
+
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, fmt, *args):
+            pass
+
+    return ZyteStubHandler
+
+class StubServer(ThreadingHTTPServer):
+    # File d'accept assez longue pour un bench concurrent (5 par défaut : SYN perdus, +1s de latence)
+    request_queue_size = 128
+    daemon_threads = True
+
+def serve(port=8765, script=(200,), retry_after=None, html=DEFAULT_HTML, fixtures=None,
+          latency_ms=0, jitter_ms=0, error_rate=0.0, rate_429=0.0, seed=None):
+    routes = load_routes(fixtures) if fixtures else None
+    handler = make_handler(list(script), retry_after, html, routes, latency_ms / 1000, jitter_ms / 1000,
+                           error_rate, rate_429, seed)
+    server = StubServer(("127.0.0.1", port), handler)
+    print(f"🧪 Zyte stub sur http://127.0.0.1:{server.server_port}/v1/extract (script={list(script)}"
+          f"{', fixtures=' + str(fixtures) if fixtures else ''})", flush=True)
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--script", default="200", help="Statuts rejoués en boucle, ex: 429,429,200")
+    parser.add_argument("--retry-after", type=float, default=None)
+    parser.add_argument("--html-file", default=None, help="HTML servi pour les réponses 200")
+    parser.add_argument("--fixtures", default=None, help="Dossier des fixtures (sert zyte/routes.json)")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Part de 503 aléatoires")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Part de 429 aléatoires")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    html = open(args.html_file, encoding="utf-8").read() if args.html_file else DEFAULT_HTML
+    serve(args.port, [int(s) for s in args.script.split(",")], args.retry_after, html, args.fixtures,
+          args.latency_ms, args.jitter_ms, args.error_rate, args.rate_429, args.seed).serve_forever()
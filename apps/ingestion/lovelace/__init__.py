@@ -0,0 +1 @@
+"""Briques communes aux jobs d'ingestion Lovelace (scrapers, backfills)."""
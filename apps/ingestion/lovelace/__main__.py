@@ -0,0 +1,17 @@
+"""Point d'entrée unique des jobs : `python -m lovelace <job> [args...]` (voir lovelace.jobs)."""
+import sys
+from lovelace.jobs import JOBS, run_job, usage
+
+def main(argv):
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return 0 if argv else 2
+    job, args = argv[0], argv[1:]
+    if job not in JOBS:
+        print(f"❌ Job inconnu : {job}\n\n{usage()}", file=sys.stderr)
+        return 2
+    run_job(job, args)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
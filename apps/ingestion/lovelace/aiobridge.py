@@ -0,0 +1,64 @@
+"""Pont async -> sync pour les ressources DLT : la boucle asyncio tourne dans son propre thread."""
+import queue
+import asyncio
+import threading
+
+_DONE = object()
+
+class _Failed:
+    def __init__(self, exc):
+        self.exc = exc
+
+def iter_async_chunks(agen_factory, chunk_size=100, max_chunks=8):
+    """
+    Lance `agen_factory()` (générateur async) sur une boucle dédiée et renvoie ses items
+    par paquets de `chunk_size`. La file est bornée à `max_chunks` paquets : si l'extraction
+    DLT (normalisation des items, écriture des fichiers de staging) est plus lente que Discord,
+    le fetch attend. Seule l'extraction chevauche le fetch : DLT ne lance normalize puis load
+    (destination, envoi Kafka) qu'une fois le générateur épuisé.
+    """
+    chunks = queue.Queue(maxsize=max_chunks)
+    stop = threading.Event()
+
+    async def pump():
+        agen = agen_factory()
+        chunk = []
+        try:
+            async for item in agen:
+                chunk.append(item)
+                if len(chunk) >= chunk_size:
+                    # put bloquant hors de la boucle : les autres fetchs continuent pendant l'attente
+                    await asyncio.to_thread(chunks.put, chunk)
+                    chunk = []
+                if stop.is_set():
+                    return
+            if chunk:
+                await asyncio.to_thread(chunks.put, chunk)
+        finally:
+            await agen.aclose()
+
+    def run():
+        try:
+            asyncio.run(pump())
+            chunks.put(_DONE)
+        except BaseException as e:
+            chunks.put(_Failed(e))
+
+    thread = threading.Thread(target=run, name="async-fetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            chunk = chunks.get()
+            if chunk is _DONE:
+                return
+            if isinstance(chunk, _Failed):
+                raise chunk.exc
+            yield chunk
+    finally:
+        # Arrêt anticipé côté consommateur : on débloque le producteur et on le laisse fermer proprement
+        stop.set()
+        while thread.is_alive():
+            try:
+                chunks.get(timeout=0.1)
+            except queue.Empty:
+                pass
@@ -0,0 +1,102 @@
+"""Mode batch commun aux scrapers : une liste de slugs/IDs en entrée, du NDJSON en sortie."""
+import os
+import sys
+import json
+import asyncio
+import argparse
+from lovelace import metrics, profiling
+from lovelace.zyte import ZyteClient, run_sync, start_item
+
+def read_inputs(path):
+    """Lit les slugs/IDs (un par ligne) depuis un fichier, ou stdin si path == '-'"""
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for line in stream:
+            line = line.strip()
+            # Lignes vides et commentaires ignorés
+            if line and not line.startswith("#"):
+                yield line
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+async def run_batch(scrape_fn, inputs, key="slug", out=None, concurrency=None):
+    """
+    Scrape les entrées en parallèle sur un ZyteClient partagé et écrit une ligne JSON
+    par résultat dès qu'il est prêt (ordre de fin, pas ordre d'entrée).
+    """
+    out = out or sys.stdout
+    count = 0
+
+    async with ZyteClient(max_in_flight=concurrency) as client:
+        async def scrape_one(item):
+            # Chaque tâche a son contexte : timings propres à l'item dans sa ligne NDJSON
+            item_timings = metrics.track_item()
+            start_item()
+            try:
+                result = await scrape_fn(client, item)
+            except Exception as e:
+                # Une entrée invalide ne doit pas tuer tout le batch
+                result = {key: item, "error": str(e)}
+            if isinstance(result, dict):
+                result["timings"] = metrics.timings(item_timings)
+            return result
+
+        def flush(done):
+            nonlocal count
+            for task in done:
+                out.write(json.dumps(task.result()) + "\n")
+                count += 1
+            out.flush()
+
+        # Fenêtre glissante : on ne lit pas tout stdin d'avance
+        pending = set()
+        for item in inputs:
+            if len(pending) >= client.max_in_flight * 2:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                flush(done)
+            pending.add(asyncio.create_task(scrape_one(item)))
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            flush(done)
+
+        print(client.summary(), file=sys.stderr)
+
+    return count
+
+def run_cli(scrape_fn, key="slug", arg_type=str, modes=None):
+    """
+    CLI commune : `script.py <slug>` garde le contrat JSON unique (callback Kestra),
+    `script.py --batch fichier|-` traite une liste et sort du NDJSON.
+    `scrape_fn` est la coroutine `(client, slug) -> dict` du scraper.
+    `modes` ajoute des flags qui remplacent `scrape_fn` : {"--flag": (coroutine, aide)}.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument(key, nargs="?", type=arg_type)
+    parser.add_argument("--batch", metavar="FILE",
+                        help="Fichier de slugs/IDs (un par ligne, '-' pour stdin) -> sortie NDJSON")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="Requêtes Zyte en vol max (défaut: ZYTE_MAX_IN_FLIGHT)")
+    for flag, (_, help_text) in (modes or {}).items():
+        parser.add_argument(flag, action="store_true", help=help_text)
+    args = parser.parse_args()
+    job = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+    profiling.install(job)
+
+    for flag, (mode_fn, _) in (modes or {}).items():
+        if getattr(args, flag.lstrip("-").replace("-", "_")):
+            scrape_fn = mode_fn
+
+    if args.batch:
+        asyncio.run(run_batch(scrape_fn, read_inputs(args.batch), key=key, concurrency=args.concurrency))
+    elif getattr(args, key) is not None:
+        result = run_sync(scrape_fn, getattr(args, key))
+        if isinstance(result, dict):
+            result["timings"] = metrics.timings()
+        print(json.dumps(result))
+    else:
+        parser.error(f"{key} ou --batch requis")
+
+    print(metrics.summary(), file=sys.stderr)
+    metrics.export(job)
@@ -0,0 +1,163 @@
+"""Cache disque des réponses Zyte (sqlite + zlib), partagé entre process."""
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+from urllib.parse import urlparse
+
+# TTL par site (secondes). Les sites absents ne sont jamais mis en cache (ex: Reddit, données à jour + cookies)
+DEFAULT_TTLS = {
+    "metacritic.com": 24 * 3600,
+    "ign.com": 24 * 3600,
+    "opencritic.com": 12 * 3600,
+    "epicgames.com": 12 * 3600,
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    site TEXT NOT NULL,
+    url TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    size INTEGER NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    body BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed_idx ON entries (accessed_at);
+"""
+
+def site_of(url):
+    host = (urlparse(url).hostname or "").lower()
+    for site in DEFAULT_TTLS:
+        if host == site or host.endswith("." + site):
+            return site
+    return host
+
+def cache_key(payload):
+    """Clé = URL cible + options Zyte (browserHtml, geolocation...), indépendante de l'ordre des champs."""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+def _header(data, name):
+    for h in data.get("httpResponseHeaders") or []:
+        if h.get("name", "").lower() == name:
+            return h.get("value")
+    return None
+
+class ZyteCache:
+    """
+    Réponses Zyte compressées sur disque, avec TTL par site et éviction LRU à la taille.
+    sqlite en WAL + busy_timeout : plusieurs workers peuvent lire/écrire la même base.
+
+    Modes : "on" (TTL normal), "offline" (sert tout ce qui est en cache, TTL ignoré,
+    pour re-parser après un changement de sélecteurs), "refresh" (pas de lecture, écriture seule).
+    """
+
+    def __init__(self, path, ttls=None, max_bytes=512 * 1024 * 1024, mode="on"):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.max_bytes = max_bytes
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    @classmethod
+    def from_env(cls):
+        """Cache activé seulement si ZYTE_CACHE_DIR est défini."""
+        cache_dir = os.getenv("ZYTE_CACHE_DIR")
+        if not cache_dir:
+            return None
+        return cls(
+            os.path.join(cache_dir, "zyte_cache.sqlite"),
+            ttls=json.loads(os.getenv("ZYTE_CACHE_TTLS", "{}")),
+            max_bytes=int(float(os.getenv("ZYTE_CACHE_MAX_MB", "512")) * 1024 * 1024),
+            mode=os.getenv("ZYTE_CACHE_MODE", "on")
+        )
+
+    def cacheable(self, payload):
+        # Jamais de cache pour les requêtes authentifiées (cookies de session)
+        return "requestCookies" not in payload and site_of(payload.get("url", "")) in self.ttls
+
+    def lookup(self, payload):
+        """
+        Renvoie (data, fresh, validators) ou None. `validators` sert à la revalidation
+        conditionnelle (If-None-Match / If-Modified-Since) d'une entrée expirée.
+        """
+        if self.mode == "refresh" or not self.cacheable(payload):
+            return None
+
+        key = cache_key(payload)
+        row = self._conn.execute(
+            "SELECT fetched_at, etag, last_modified, body FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if not row:
+            self.misses += 1
+            return None
+
+        fetched_at, etag, last_modified, body = row
+        fresh = self.mode == "offline" or time.time() - fetched_at < self.ttls[site_of(payload["url"])]
+        if fresh:
+            self.hits += 1
+            self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        else:
+            self.misses += 1
+        return json.loads(zlib.decompress(body)), fresh, {"etag": etag, "last_modified": last_modified}
+
+    def touch(self, payload):
+        """Entrée revalidée (304) : on repart pour un TTL complet sans réécrire le corps."""
+        now = time.time()
+        self.revalidated += 1
+        self._conn.execute("UPDATE entries SET fetched_at = ?, accessed_at = ? WHERE key = ?",
+                           (now, now, cache_key(payload)))
+
+    def store(self, payload, data):
+        if not self.cacheable(payload) or data.get("statusCode", 200) >= 400:
+            return
+        body = zlib.compress(json.dumps(data).encode("utf-8"), 6)
+        now = time.time()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO entries (key, site, url, fetched_at, accessed_at, size, etag, last_modified, body) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (cache_key(payload), site_of(payload["url"]), payload["url"], now, now, len(body),
+             _header(data, "etag"), _header(data, "last-modified"), body)
+        )
+        self._evict()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # LRU : on supprime les moins récemment lus jusqu'à repasser sous la limite
+        freed = 0
+        keys = []
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+            keys.append((key,))
+            freed += size
+            if total - freed <= self.max_bytes:
+                break
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", keys)
+
+    def summary(self):
+        return f"🗄️ Cache Zyte: {self.hits} hits, {self.misses} misses, {self.revalidated} revalidés (304)"
+
+    def close(self):
+        self._conn.close()
+
+def with_validators(payload, validators):
+    """Ajoute les en-têtes conditionnels à une requête httpResponseBody pour revalider une entrée expirée."""
+    headers = []
+    if validators.get("etag"):
+        headers.append({"name": "If-None-Match", "value": validators["etag"]})
+    if validators.get("last_modified"):
+        headers.append({"name": "If-Modified-Since", "value": validators["last_modified"]})
+    if not headers or not payload.get("httpResponseBody"):
+        return payload
+    return {**payload, "customHttpRequestHeaders": payload.get("customHttpRequestHeaders", []) + headers}
@@ -0,0 +1,105 @@
+"""
+Extraction HTML rapide pour les parsers de scores : selectolax (lexbor) quand il est
+installé, parsel en repli. On n'expose que le sous-ensemble de l'API parsel utilisé
+par nos scripts (css, ::text, ::attr, get/getall), avec la même sémantique.
+"""
+import os
+import re
+from functools import lru_cache
+from lovelace import metrics
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # selectolax absent : tout passe par parsel
+    LexborHTMLParser = None
+
+# LOVELACE_FAST_HTML=0 force parsel partout (comparaison, incident de parsing)
+FAST_HTML = os.getenv("LOVELACE_FAST_HTML", "1").lower() not in ("0", "false", "no") and LexborHTMLParser is not None
+
+PSEUDO = re.compile(r"(\s*)::(text|attr\(([^)]+)\))\s*$")
+
+@lru_cache(maxsize=256)
+def compile_query(query):
+    """'a b::text' -> ('a b', 'text', None) ; 'a ::text' -> ('a', 'deep_text', None) ; '::attr(x)' -> attr."""
+    match = PSEUDO.search(query)
+    if not match:
+        return query.strip(), None, None
+    css = query[:match.start()].strip()
+    if match.group(3):
+        return css, "attr", match.group(3).strip()
+    return css, "deep_text" if match.group(1) else "text", None
+
+class FastSelectorList(list):
+    """Liste de FastSelector (noeuds) ou de chaînes (::text / ::attr), comme parsel.SelectorList."""
+
+    def css(self, query):
+        return FastSelectorList(item for node in self for item in node.css(query))
+
+    def get(self, default=None):
+        for item in self:
+            return item if isinstance(item, str) else item.get()
+        return default
+
+    def getall(self):
+        return [item if isinstance(item, str) else item.get() for item in self]
+
+class FastSelector:
+    """Noeud selectolax habillé à la parsel."""
+
+    def __init__(self, html=None, node=None):
+        self.node = node if node is not None else LexborHTMLParser(html).root
+
+    def css(self, query):
+        css, pseudo, attr = compile_query(query)
+        nodes = self.node.css(css) if css else [self.node]
+        if pseudo is None:
+            return FastSelectorList(FastSelector(node=n) for n in nodes)
+        if pseudo == "attr":
+            return FastSelectorList(n.attributes[attr] for n in nodes if n.attributes.get(attr) is not None)
+        values = FastSelectorList()
+        for n in nodes:
+            # ::text = noeuds texte enfants directs ; ' ::text' = tous les noeuds texte descendants
+            children = n.traverse(include_text=True) if pseudo == "deep_text" else n.iter(include_text=True)
+            values.extend(c.text(deep=False) for c in children if c.tag == "-text")
+        return values
+
+    def get(self):
+        return self.node.html
+
+def has_marker(html, markers):
+    """
+    Scan brut avant tout parse : si aucun marqueur n'apparaît, aucun sélecteur ne peut matcher.
+    Simple recherche de sous-chaîne (bien plus rapide qu'une regex IGNORECASE sur une grosse page) ;
+    la forme majuscule couvre les noms de balises, que les parseurs HTML normalisent.
+    """
+    return any(m in html or m.upper() in html for m in markers)
+
+def make_selector(html, engine=None):
+    """engine : "fast" | "parsel" | None (= fast si disponible)."""
+    if engine == "fast" or (engine is None and FAST_HTML):
+        return FastSelector(html)
+    from parsel import Selector
+    return Selector(text=html)
+
+def extract(html, parse, markers=(), engine=None):
+    """
+    parse(sel) lit les valeurs brutes de la page et renvoie None quand il ne trouve rien.
+    Pas de marqueur dans le HTML -> None sans construire d'arbre ; raté du fast path -> parsel.
+    """
+    if not html:
+        return None
+    with metrics.timer("parse"):
+        return _extract(html, parse, markers, engine)
+
+def _extract(html, parse, markers, engine):
+    if markers and not has_marker(html, markers):
+        return None
+    if engine is None and FAST_HTML:
+        try:
+            result = parse(FastSelector(html))
+            if result is not None:
+                return result
+        except Exception:
+            pass
+        engine = "parsel"
+    return parse(make_selector(html, engine))
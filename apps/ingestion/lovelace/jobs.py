@@ -0,0 +1,39 @@
+"""
+Registre des jobs lançables par `python -m lovelace <job> [args...]`.
+
+Chaque job reste un script autonome (scraping/, backfill/) : le dispatcher ne charge que
+le script demandé, donc seules ses dépendances sont importées (pas de dlt/discord/kafka
+pour un scrape Zyte, pas de httpx pour un import CSV).
+"""
+import os
+import sys
+import runpy
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# job -> (script relatif à APP_DIR, description)
+JOBS = {
+    "discord-backfill": ("backfill/discord_dlt_pipeline.py", "Backfill de l'historique Discord vers Redpanda"),
+    "discord-channels": ("scraping/discord/channels.py", "Sync des salons Discord (guildId,...)"),
+    "csv": ("backfill/csv_to_clickhouse.py", "Import CSV / NDJSON / Parquet de S3 vers ClickHouse"),
+    "reddit-moderators": ("backfill/reddit_moderators.py", "Sync des modérateurs Reddit (--all pour tous les jeux)"),
+    "epic": ("scraping/epic_score.py", "Note Epic Games Store (slug)"),
+    "ign": ("scraping/ign_score.py", "Note IGN (slug)"),
+    "metacritic": ("scraping/metacritic_score.py", "Notes Metacritic (slug)"),
+    "opencritic": ("scraping/opencritic_score.py", "Notes OpenCritic (id)"),
+}
+
+def script_path(job):
+    return os.path.join(APP_DIR, JOBS[job][0])
+
+def run_job(job, args):
+    """Exécute le script du job comme `python script.py args...` (même sys.argv, même __main__)."""
+    path = script_path(job)
+    sys.argv = [path, *args]
+    sys.path.insert(0, os.path.dirname(path))
+    runpy.run_path(path, run_name="__main__")
+
+def usage():
+    lines = ["usage: python -m lovelace <job> [args...]", "", "jobs :"]
+    lines += [f"  {job:<20} {description}" for job, (_, description) in JOBS.items()]
+    return "\n".join(lines)
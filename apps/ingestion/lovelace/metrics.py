@@ -0,0 +1,129 @@
+"""
+Timers et compteurs par étape (fetch, decode, parse, serialize, produce, db_write...)
+pour tous les jobs d'ingestion. Registre global du process, plus un registre par item
+(contextvars) pour que chaque ligne de sortie d'un batch ait ses propres `timings`.
+
+    with metrics.timer("parse"):
+        ...
+    metrics.incr("rows", len(chunk))
+    metrics.export("csv_to_clickhouse")   # LOVELACE_METRICS_FILE / LOVELACE_PUSHGATEWAY
+
+Les timers mesurent du temps mural : sur des tâches async concurrentes, la somme d'une
+étape peut dépasser la durée du run.
+"""
+import os
+import re
+import sys
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Fichier OpenMetrics écrit en fin de job, et/ou URL d'une pushgateway (ex: http://pushgateway:9091)
+METRICS_FILE = os.getenv("LOVELACE_METRICS_FILE")
+PUSHGATEWAY_URL = os.getenv("LOVELACE_PUSHGATEWAY")
+
+_lock = threading.Lock()
+_timers = {}
+_counters = {}
+_item = contextvars.ContextVar("lovelace_metrics_item", default=None)
+
+def _add_timer(registry, stage, elapsed):
+    total, calls = registry.get(stage, (0.0, 0))
+    registry[stage] = (total + elapsed, calls + 1)
+
+@contextmanager
+def timer(stage):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        with _lock:
+            _add_timer(_timers, stage, elapsed)
+        item = _item.get()
+        if item is not None:
+            _add_timer(item, stage, elapsed)
+
+def timed_iter(iterable, stage):
+    """Chronomètre chaque next() d'un itérateur (lecture en flux consommée par DLT) sans compter le travail du consommateur."""
+    iterator = iter(iterable)
+    while True:
+        with timer(stage):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+def incr(name, value=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+def track_item():
+    """
+    Ouvre un registre propre à l'item courant (à appeler au début de la tâche asyncio
+    qui le traite : chaque tâche a sa copie du contexte). Renvoie le dict à passer à timings().
+    """
+    item = {}
+    _item.set(item)
+    return item
+
+def timings(registry=None):
+    """{étape: {"ms": total, "calls": n}} du registre donné (défaut : process)."""
+    with _lock:
+        registry = dict(_timers if registry is None else registry)
+    return {stage: {"ms": round(total * 1000, 2), "calls": calls} for stage, (total, calls) in registry.items()}
+
+def counters():
+    with _lock:
+        return dict(_counters)
+
+def summary():
+    """Ligne lisible pour stderr."""
+    parts = [f"{stage} {t['ms'] / 1000:.2f}s/{t['calls']}" for stage, t in timings().items()]
+    parts += [f"{name}={value}" for name, value in counters().items()]
+    return "⏱️ " + (", ".join(parts) if parts else "aucune mesure")
+
+def openmetrics(job, prometheus=False):
+    """
+    Exposition OpenMetrics (texte) des timers et compteurs du process. `prometheus=True`
+    donne le format texte classique (TYPE sur le nom en _total, sans "# EOF") pour la pushgateway.
+    """
+    lines = []
+
+    def family(name, help_text, samples):
+        metric = re.sub(r"[^a-zA-Z0-9_]", "_", name)
+        type_name = f"{metric}_total" if prometheus else metric
+        lines.append(f"# TYPE {type_name} counter")
+        if help_text:
+            lines.append(f"# HELP {type_name} {help_text}")
+        for labels, value in samples:
+            label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+            lines.append(f"{metric}_total{{{label_text}}} {value}")
+
+    stages = timings()
+    family("lovelace_stage_seconds", "Temps mural cumulé par étape.",
+           [({"job": job, "stage": stage}, t["ms"] / 1000) for stage, t in stages.items()])
+    family("lovelace_stage_calls", "Passages par étape.",
+           [({"job": job, "stage": stage}, t["calls"]) for stage, t in stages.items()])
+    for name, value in counters().items():
+        family(f"lovelace_{name}", None, [({"job": job}, value)])
+    if not prometheus:
+        lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+def export(job):
+    """Écrit le fichier OpenMetrics et/ou pousse vers la pushgateway, si configurés. Jamais bloquant pour le job."""
+    if not METRICS_FILE and not PUSHGATEWAY_URL:
+        return
+    if METRICS_FILE:
+        with open(METRICS_FILE, "w", encoding="utf-8") as f:
+            f.write(openmetrics(job))
+    if PUSHGATEWAY_URL:
+        try:
+            import httpx
+            httpx.put(f"{PUSHGATEWAY_URL.rstrip('/')}/metrics/job/{job}",
+                      content=openmetrics(job, prometheus=True), timeout=5)
+        except Exception as e:
+            print(f"⚠️ Push métriques impossible : {e}", file=sys.stderr)
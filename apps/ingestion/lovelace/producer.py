@@ -0,0 +1,85 @@
+"""Producer Kafka/Redpanda unique par process, partagé par les destinations DLT."""
+import os
+import threading
+from lovelace import metrics
+
+KAFKA_BROKERS = os.getenv("KAFKA_BROKERS", "localhost:19092")
+# none | gzip | snappy | lz4 | zstd (lz4/zstd demandent les libs `lz4` / `zstandard`)
+KAFKA_COMPRESSION = os.getenv("KAFKA_COMPRESSION", "lz4")
+KAFKA_LINGER_MS = int(os.getenv("KAFKA_LINGER_MS", "50"))
+KAFKA_BATCH_SIZE = int(os.getenv("KAFKA_BATCH_SIZE", str(256 * 1024)))
+# Taille des lots que DLT passe à nos destinations custom
+DLT_BATCH_SIZE = int(os.getenv("DLT_BATCH_SIZE", "1000"))
+
+_producer = None
+_lock = threading.Lock()
+# "failed" est remis à zéro à chaque flush, "failed_total" couvre tout le job
+_delivery = {"sent": 0, "delivered": 0, "failed": 0, "failed_total": 0}
+_errors = []
+
+def get_producer():
+    """Créé au premier envoi puis réutilisé : une connexion broker et un fetch de metadata pour tout le job."""
+    global _producer
+    with _lock:
+        if _producer is None:
+            # Import différé : kafka (et botocore via SASL/MSK) pèse ~200ms au démarrage
+            from kafka import KafkaProducer
+            _producer = KafkaProducer(
+                bootstrap_servers=KAFKA_BROKERS,
+                compression_type=None if KAFKA_COMPRESSION == "none" else KAFKA_COMPRESSION,
+                linger_ms=KAFKA_LINGER_MS,
+                batch_size=KAFKA_BATCH_SIZE
+            )
+    return _producer
+
+def _on_delivered(_metadata):
+    with _lock:
+        _delivery["delivered"] += 1
+
+def _on_failed(exc):
+    with _lock:
+        _delivery["failed"] += 1
+        _delivery["failed_total"] += 1
+        if len(_errors) < 10:
+            _errors.append(repr(exc))
+
+def send(topic, key, value):
+    """Envoi non bloquant ; le résultat de livraison remonte par callbacks."""
+    with metrics.timer("produce"):
+        future = get_producer().send(topic, key=key, value=value)
+        future.add_callback(_on_delivered)
+        future.add_errback(_on_failed)
+    # send() est appelé en parallèle par les threads de load DLT
+    with _lock:
+        _delivery["sent"] += 1
+
+def flush(timeout=None):
+    """
+    À appeler aux frontières de checkpoint et en fin de pipeline seulement.
+    Lève une erreur si des messages ont échoué depuis le dernier flush : l'appelant
+    ne doit pas avancer ses curseurs dans ce cas.
+    """
+    if _producer is None:
+        return
+    with metrics.timer("flush"):
+        _producer.flush(timeout)
+    with _lock:
+        failed = _delivery["failed"]
+        errors = list(_errors)
+        _delivery["failed"] = 0
+        _errors.clear()
+    if failed:
+        raise RuntimeError(f"❌ {failed} messages non livrés à Redpanda: {errors}")
+
+def close():
+    global _producer
+    if _producer is not None:
+        flush()
+        _producer.close()
+        _producer = None
+
+def delivery_summary():
+    with _lock:
+        sent, delivered, failed = _delivery["sent"], _delivery["delivered"], _delivery["failed_total"]
+    return (f"📤 Redpanda: {sent} envoyés, {delivered} livrés, {failed} en échec "
+            f"(compression={KAFKA_COMPRESSION}, linger={KAFKA_LINGER_MS}ms, batch={KAFKA_BATCH_SIZE}o)")
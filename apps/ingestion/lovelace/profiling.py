@@ -0,0 +1,197 @@
+"""
+Profilage par échantillonnage, activé par variable d'environnement, pour tous les jobs :
+
+    LOVELACE_PROFILE=wall,cpu         ("1" : wall + cpu ; ajouter "alloc" pour tracemalloc)
+    LOVELACE_PROFILE_DIR=.            (défaut : répertoire courant, à côté de result.json)
+    LOVELACE_PROFILE_INTERVAL_MS=10
+
+Un thread échantillonne les piles de tous les threads (sys._current_frames) :
+- vue "wall" : chaque échantillon compte pour l'intervalle, que le thread calcule ou attende ;
+- vue "cpu" : chaque pile est pondérée par le temps CPU consommé par son thread depuis
+  l'échantillon précédent (horloge CPU par thread), donc les attentes réseau disparaissent ;
+- "alloc" : tracemalloc (les buffers numpy/pandas y sont déclarés), top des allocations vivantes.
+  Nettement plus coûteux que l'échantillonnage : à réserver au chemin pandas du CSV.
+
+Sorties : profile-<job>.speedscope.json (les vues dans un seul fichier, https://speedscope.app),
+profile-<job>.<vue>.collapsed (flamegraph.pl / inferno) et profile-<job>.alloc.txt.
+Les processus du pool de parse CSV ne sont pas échantillonnés.
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+from contextlib import ExitStack, contextmanager
+
+PROFILE = os.getenv("LOVELACE_PROFILE", "")
+PROFILE_DIR = os.getenv("LOVELACE_PROFILE_DIR", ".")
+PROFILE_INTERVAL_MS = float(os.getenv("LOVELACE_PROFILE_INTERVAL_MS", "10"))
+PROFILE_ALLOC_FRAMES = int(os.getenv("LOVELACE_PROFILE_ALLOC_FRAMES", "10"))
+
+def requested_views(value=None):
+    value = (PROFILE if value is None else value).strip().lower()
+    if value in ("", "0", "false", "no"):
+        return set()
+    if value in ("1", "true", "yes", "all"):
+        return {"wall", "cpu"}
+    return {v.strip() for v in value.split(",") if v.strip()}
+
+def thread_cpu_time(ident):
+    """Temps CPU (s) d'un thread, None si la plateforme ne l'expose pas."""
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(ident))
+    except (AttributeError, OSError):
+        return None
+
+class Sampler:
+    """Thread d'échantillonnage : piles agrégées par vue, {(frame, ...): poids}."""
+
+    def __init__(self, views, interval_ms):
+        self.views = views
+        self.interval = interval_ms / 1000
+        self.stacks = {"wall": {}, "cpu": {}}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="lovelace-profiler", daemon=True)
+        self._cpu_seen = {}
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _stack(self, frame, thread_name):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_name, code.co_filename, frame.f_lineno))
+            frame = frame.f_back
+        stack.append((f"thread:{thread_name}", "", 0))
+        return tuple(reversed(stack))
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            self.samples += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = self._stack(frame, names.get(ident, ident))
+                if "wall" in self.views:
+                    wall = self.stacks["wall"]
+                    wall[stack] = wall.get(stack, 0) + self.interval * 1000
+                if "cpu" in self.views:
+                    now = thread_cpu_time(ident)
+                    if now is None:
+                        continue
+                    spent = now - self._cpu_seen.get(ident, now)
+                    self._cpu_seen[ident] = now
+                    if spent > 0:
+                        cpu = self.stacks["cpu"]
+                        cpu[stack] = cpu.get(stack, 0) + spent * 1000
+
+def frame_label(frame):
+    name, filename, line = frame
+    return f"{name} ({os.path.basename(filename)}:{line})" if filename else name
+
+def write_collapsed(path, stacks):
+    """Format 'a;b;c poids' (poids entier en ms) pour flamegraph.pl / inferno."""
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, weight in sorted(stacks.items(), key=lambda kv: -kv[1]):
+            if round(weight):
+                f.write(";".join(frame_label(fr).replace(";", ",") for fr in stack) + f" {round(weight)}\n")
+
+def write_speedscope(path, job, views):
+    """Un seul fichier speedscope, un profil 'sampled' par vue (unité : ms)."""
+    frames, index = [], {}
+    profiles = []
+    for view, stacks in views.items():
+        samples, weights = [], []
+        for stack, weight in stacks.items():
+            ids = []
+            for fr in stack:
+                if fr not in index:
+                    index[fr] = len(frames)
+                    frames.append({"name": fr[0], "file": fr[1] or None, "line": fr[2] or None})
+                ids.append(index[fr])
+            samples.append(ids)
+            weights.append(round(weight, 3))
+        profiles.append({
+            "type": "sampled", "name": f"{job} ({view})", "unit": "milliseconds",
+            "startValue": 0, "endValue": round(sum(weights), 3),
+            "samples": samples, "weights": weights
+        })
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": job, "exporter": "lovelace.profiling",
+            "shared": {"frames": frames}, "profiles": profiles
+        }, f)
+
+def write_alloc(path, snapshot, peak, limit=40):
+    import tracemalloc
+    # Les modules importés en cours de job ne nous intéressent pas
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>", all_frames=True),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>", all_frames=True)
+    ])
+    lines = [f"Pic mémoire tracée : {peak / 1024 / 1024:.1f} Mo", ""]
+    for stat in snapshot.statistics("traceback")[:limit]:
+        lines.append(f"{stat.size / 1024 / 1024:.2f} Mo en {stat.count} blocs")
+        lines += [f"    {line}" for line in stat.traceback.format(most_recent_first=True)[:8]]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+@contextmanager
+def profiled(job, views=None):
+    """
+    Entoure le corps d'un job. Sans LOVELACE_PROFILE, ne fait rien. Les fichiers sont écrits
+    même si le job lève (c'est souvent le run qu'on veut comprendre).
+    """
+    views = requested_views() if views is None else views
+    if not views:
+        yield
+        return
+
+    sampler = None
+    if views & {"wall", "cpu"}:
+        sampler = Sampler(views, PROFILE_INTERVAL_MS)
+        sampler.start()
+    if "alloc" in views:
+        import tracemalloc
+        tracemalloc.start(PROFILE_ALLOC_FRAMES)
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        base = os.path.join(PROFILE_DIR, f"profile-{job}")
+        written = []
+        if sampler:
+            sampler.stop()
+            stacks = {v: sampler.stacks[v] for v in ("wall", "cpu") if v in views}
+            for view, view_stacks in stacks.items():
+                write_collapsed(f"{base}.{view}.collapsed", view_stacks)
+                written.append(f"{base}.{view}.collapsed")
+            write_speedscope(f"{base}.speedscope.json", job, stacks)
+            written.append(f"{base}.speedscope.json")
+        if "alloc" in views:
+            import tracemalloc
+            _, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            write_alloc(f"{base}.alloc.txt", snapshot, peak)
+            written.append(f"{base}.alloc.txt")
+        samples = sampler.samples if sampler else 0
+        print(f"🔬 Profil {job} ({time.monotonic() - started:.1f}s, {samples} échantillons) : {', '.join(written)}",
+              file=sys.stderr)
+
+def install(job):
+    """Pour les blocs __main__ linéaires : profile jusqu'à la sortie du process (exception ou sys.exit compris)."""
+    stack = ExitStack()
+    stack.enter_context(profiled(job))
+    atexit.register(stack.close)
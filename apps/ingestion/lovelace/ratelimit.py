@@ -0,0 +1,66 @@
+"""Pacing et retries côté client pour les appels Zyte (429/5xx)."""
+import time
+import random
+import asyncio
+from email.utils import parsedate_to_datetime
+
+# Codes Zyte/HTTP qui valent un nouvel essai (quota, surcharge, erreur de download temporaire)
+RETRYABLE_STATUS = {429, 500, 502, 503, 504, 520, 521}
+
+class TokenBucket:
+    """
+    Budget de requêtes du compte : `rate` jetons/seconde, rafale max `burst`.
+    Tous les scrapes du process piochent dans le même seau.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        # Le lock sert la file dans l'ordre d'arrivée
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+def parse_retry_after(value):
+    """Retry-After en secondes (`"12"`) ou date HTTP. None si absent/illisible."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class RetryPolicy:
+    """Backoff exponentiel à jitter complet, borné par une durée totale de retry par item."""
+
+    def __init__(self, max_retry_time=120, base_delay=1.0, max_delay=30.0):
+        self.max_retry_time = max_retry_time
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt, retry_after=None):
+        if retry_after is not None:
+            # Le serveur sait mieux que nous : on respecte, avec un peu de jitter pour désynchroniser
+            return retry_after + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def should_retry(self, status_code):
+        return status_code is None or status_code in RETRYABLE_STATUS
@@ -0,0 +1,69 @@
+"""Accès S3 / MinIO (lovelace-s3) : résolution de préfixes/globs et téléchargements parallèles."""
+import os
+import fnmatch
+from concurrent.futures import ThreadPoolExecutor
+
+# Fichiers téléchargés en parallèle, et découpage en GET par plages au-delà du seuil
+S3_CONCURRENCY = int(os.getenv("S3_CONCURRENCY", "4"))
+S3_MULTIPART_THRESHOLD_MB = int(os.getenv("S3_MULTIPART_THRESHOLD_MB", "64"))
+S3_MULTIPART_CHUNK_MB = int(os.getenv("S3_MULTIPART_CHUNK_MB", "16"))
+S3_RANGE_CONCURRENCY = int(os.getenv("S3_RANGE_CONCURRENCY", "8"))
+
+GLOB_CHARS = "*?["
+
+def is_pattern(key):
+    """Un S3_KEY se terminant par '/' est un préfixe, un S3_KEY avec * ? [ est un glob."""
+    return key.endswith("/") or any(c in key for c in GLOB_CHARS)
+
+def list_keys(s3, bucket, pattern):
+    """Clés correspondant au préfixe ou au glob, triées (l'ordre de chargement en dépend)."""
+    if not is_pattern(pattern):
+        return [pattern]
+
+    # On liste à partir de la partie fixe du motif pour ne pas parcourir tout le bucket
+    prefix = pattern
+    for c in GLOB_CHARS:
+        prefix = prefix.split(c, 1)[0]
+
+    keys = []
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            key = obj["Key"]
+            if key.endswith("/"):
+                continue
+            if pattern.endswith("/") or fnmatch.fnmatchcase(key, pattern):
+                keys.append(key)
+    return sorted(keys)
+
+def transfer_config():
+    """Au-delà du seuil, boto3 découpe le GET en plages (Range) téléchargées en parallèle."""
+    from boto3.s3.transfer import TransferConfig
+
+    mb = 1024 * 1024
+    return TransferConfig(
+        multipart_threshold=S3_MULTIPART_THRESHOLD_MB * mb,
+        multipart_chunksize=S3_MULTIPART_CHUNK_MB * mb,
+        max_concurrency=S3_RANGE_CONCURRENCY,
+        use_threads=True
+    )
+
+def local_path(directory, key):
+    return os.path.join(directory, key.replace("/", "__"))
+
+def download_all(s3, bucket, keys, directory, concurrency=None):
+    """
+    Lance les téléchargements en parallèle et renvoie {clé: future(chemin local)},
+    pour que l'appelant traite chaque fichier dès qu'il est arrivé.
+    """
+    config = transfer_config()
+    pool = ThreadPoolExecutor(max_workers=concurrency or S3_CONCURRENCY)
+
+    def fetch(key):
+        path = local_path(directory, key)
+        s3.download_file(bucket, key, path, Config=config)
+        return path
+
+    futures = {key: pool.submit(fetch, key) for key in keys}
+    pool.shutdown(wait=False)
+    return futures
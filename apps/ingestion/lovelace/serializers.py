@@ -0,0 +1,86 @@
+"""Sérialisation des payloads Kafka : JSON (stdlib ou orjson) ou Avro via un registre de schémas local."""
+import os
+import io
+import json
+import struct
+from datetime import datetime
+
+# json (historique) | orjson (défaut, datetime natif) | avro (binaire, wire format Confluent)
+KAFKA_SERIALIZER = os.getenv("KAFKA_SERIALIZER", "orjson")
+SCHEMAS_DIR = os.path.join(os.path.dirname(__file__), "schemas")
+
+def json_serializer(obj):
+    if isinstance(obj, (datetime,)):
+        return obj.isoformat()
+    raise TypeError(f"Type {type(obj)} not serializable")
+
+class JsonSerializer:
+    """Comportement historique : json.dumps + fallback Python pour les datetime."""
+    name = "json"
+
+    def __call__(self, value):
+        return json.dumps(value, default=json_serializer).encode('utf-8')
+
+class OrjsonSerializer:
+    """Même JSON côté consommateurs (Connect), encodé en Rust : datetime ISO 8601 sans callback Python."""
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+        self._dumps = orjson.dumps
+        self._options = orjson.OPT_NON_STR_KEYS
+
+    def __call__(self, value):
+        # `default` ne sert que pour les sous-classes de datetime (ex: pendulum via DLT)
+        return self._dumps(value, default=json_serializer, option=self._options)
+
+class LocalSchemaRegistry:
+    """
+    Remplaçant local d'un Schema Registry : subject -> (id, schéma) lus depuis lovelace/schemas.
+    Les IDs sont figés dans registry.json pour rester stables entre producteurs et consommateurs.
+    """
+
+    def __init__(self, path=SCHEMAS_DIR):
+        self.path = path
+        with open(os.path.join(path, "registry.json"), encoding="utf-8") as f:
+            self._subjects = json.load(f)
+
+    def get(self, subject):
+        from fastavro import parse_schema
+        entry = self._subjects.get(subject)
+        if not entry:
+            raise KeyError(f"Schéma inconnu pour le subject {subject}")
+        with open(os.path.join(self.path, entry["file"]), encoding="utf-8") as f:
+            return entry["id"], parse_schema(json.load(f))
+
+class AvroSerializer:
+    """
+    Avro schemaless + en-tête Confluent (octet magique 0, ID de schéma sur 4 octets big-endian).
+    Les champs à structure libre (embeds) sont passés en chaînes JSON.
+    """
+    name = "avro"
+
+    def __init__(self, topic, registry=None):
+        from fastavro import schemaless_writer
+        self._writer = schemaless_writer
+        self.schema_id, self.schema = (registry or LocalSchemaRegistry()).get(f"{topic}-value")
+        self._header = struct.pack(">bI", 0, self.schema_id)
+
+    def __call__(self, value):
+        if "embeds" in value:
+            value = {**value, "embeds": [e if isinstance(e, str) else json.dumps(e, default=json_serializer) for e in value["embeds"]]}
+        buf = io.BytesIO()
+        buf.write(self._header)
+        self._writer(buf, self.schema, value)
+        return buf.getvalue()
+
+def get_serializer(topic, name=None):
+    """Sérialiseur pour un topic, choisi par KAFKA_SERIALIZER (ou `name`)."""
+    name = name or KAFKA_SERIALIZER
+    if name == "json":
+        return JsonSerializer()
+    if name == "orjson":
+        return OrjsonSerializer()
+    if name == "avro":
+        return AvroSerializer(topic)
+    raise ValueError(f"Sérialiseur inconnu : {name}")
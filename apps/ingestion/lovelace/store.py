@@ -0,0 +1,97 @@
+"""Petit état persistant clé/valeur (JSON) pour les jobs d'ingestion : Postgres en prod, sqlite en local."""
+import os
+import json
+import sqlite3
+import threading
+
+STATE_DIR = os.getenv("LOVELACE_STATE_DIR", os.path.expanduser("~/.cache/lovelace"))
+# Les conteneurs Kestra sont éphémères : avec une URL Postgres, l'état vit dans la table
+# ingestion_state (migration apps/api/drizzle/0007). Sans, sqlite sous LOVELACE_STATE_DIR.
+STATE_URL = os.getenv("LOVELACE_STATE_URL") or os.getenv("DB_URL")
+
+class StateStore:
+    """
+    Valeurs JSON rangées par namespace (ex: "opencritic_tiers", "epic_sandbox_ids").
+    Backend Postgres si LOVELACE_STATE_URL (ou DB_URL) est défini, sinon sqlite local.
+    """
+
+    def __init__(self, namespace, path=None, url=None):
+        self.namespace = namespace
+        # Utilisable depuis les threads du loader DLT : les accès passent par un lock
+        self._lock = threading.Lock()
+        self.url = url or (None if path else STATE_URL)
+        if self.url:
+            import psycopg2
+            self._conn = psycopg2.connect(self.url)
+            self._conn.autocommit = True
+            return
+
+        path = path or os.path.join(STATE_DIR, "state.sqlite")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS state ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+
+    def _query(self, sqlite_sql, pg_sql, params=(), many=False):
+        """Exécute la requête du backend actif ; renvoie les lignes (valeurs en texte JSON)."""
+        with self._lock:
+            if not self.url:
+                run = self._conn.executemany if many else self._conn.execute
+                return run(sqlite_sql, params).fetchall()
+            with self._conn.cursor() as cur:
+                if many:
+                    cur.executemany(pg_sql, params)
+                    return []
+                cur.execute(pg_sql, params)
+                return cur.fetchall() if cur.description else []
+
+    def get(self, key, default=None):
+        rows = self._query(
+            "SELECT value FROM state WHERE namespace = ? AND key = ?",
+            "SELECT value::text FROM ingestion_state WHERE namespace = %s AND key = %s",
+            (self.namespace, str(key))
+        )
+        return json.loads(rows[0][0]) if rows else default
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def set_many(self, values):
+        if not values:
+            return
+        self._query(
+            "INSERT OR REPLACE INTO state (namespace, key, value) VALUES (?, ?, ?)",
+            "INSERT INTO ingestion_state (namespace, key, value, updated_at) VALUES (%s, %s, %s::jsonb, NOW())"
+            " ON CONFLICT (namespace, key) DO UPDATE SET value = EXCLUDED.value, updated_at = NOW()",
+            [(self.namespace, str(k), json.dumps(v)) for k, v in values.items()],
+            many=True
+        )
+
+    def delete(self, key):
+        self._query(
+            "DELETE FROM state WHERE namespace = ? AND key = ?",
+            "DELETE FROM ingestion_state WHERE namespace = %s AND key = %s",
+            (self.namespace, str(key))
+        )
+
+    def clear(self):
+        self._query(
+            "DELETE FROM state WHERE namespace = ?",
+            "DELETE FROM ingestion_state WHERE namespace = %s",
+            (self.namespace,)
+        )
+
+    def items(self):
+        rows = self._query(
+            "SELECT key, value FROM state WHERE namespace = ?",
+            "SELECT key, value::text FROM ingestion_state WHERE namespace = %s",
+            (self.namespace,)
+        )
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,420 @@
+"""Lecture des fichiers partenaires (CSV, NDJSON, Parquet, compressés ou non) en flux, avec les transformations Lovelace par chunk."""
+import io
+import os
+import csv
+import json
+
+# Lignes par chunk (pandas) / octets par bloc (Arrow) : la mémoire max dépend de ces chiffres
+CSV_CHUNK_ROWS = int(os.getenv("CSV_CHUNK_ROWS", "100000"))
+CSV_BLOCK_BYTES = int(os.getenv("CSV_BLOCK_BYTES", str(16 * 1024 * 1024)))
+# csv | ndjson | parquet : force le format au lieu de le déduire de l'extension
+FILE_FORMAT = os.getenv("FILE_FORMAT") or None
+
+COMPRESSIONS = {".gz": "gzip", ".zst": "zstd", ".zstd": "zstd"}
+FORMATS = {".csv": "csv", ".tsv": "csv", ".txt": "csv",
+           ".ndjson": "ndjson", ".jsonl": "ndjson", ".json": "json",
+           ".parquet": "parquet", ".pq": "parquet"}
+
+def snake_case(name):
+    return name.strip().replace(' ', '_').lower()
+
+def parse_mapping(mapping_str):
+    """
+    MAPPING_JSON : { "Colonne CSV": "colonne_clickhouse" } ou, pour typer la colonne,
+    { "Colonne CSV": {"name": "colonne_clickhouse", "type": "Int64"} } (types ClickHouse).
+    Renvoie (renommages, types par colonne cible).
+    """
+    try:
+        raw = json.loads(mapping_str) or {}
+    except Exception as e:
+        print(f"⚠️ Error parsing MAPPING_JSON: {e}")
+        return {}, {}
+
+    renames, types = {}, {}
+    for source, target in raw.items():
+        if isinstance(target, dict):
+            name = target.get("name", source)
+            if target.get("type"):
+                types[snake_case(name)] = target["type"]
+            target = name
+        renames[source] = target
+    if renames:
+        print(f"🔄 Applying mapping: {renames}")
+    return renames, types
+
+def transform_chunk(df, mapping, game_id):
+    """Mapping, game_id et snake_case, appliqués chunk par chunk."""
+    # Le mapping est supposé être : { "Nom Colonne CSV": "nom_colonne_clickhouse" }
+    if mapping:
+        df = df.rename(columns=mapping)
+
+    if game_id:
+        df["game_id"] = game_id
+    
+    # Nettoyage automatique des noms de colonnes pour ClickHouse (snake_case)
+    df.columns = [snake_case(c) for c in df.columns]
+    return df
+
+# dtype inféré par pandas -> équivalent nullable : un NaN plus loin dans le fichier ne change pas le type
+NULLABLE_DTYPES = {"i": "Int64", "u": "Int64", "f": "Float64", "b": "boolean"}
+
+def pin_dtypes(chunk):
+    """
+    Types du premier chunk, imposés aux suivants : pandas infère chunk par chunk, une colonne
+    pourrait sinon changer de type à chaque chunk (colonnes variantes côté DLT).
+    Seul élargissement permis ensuite : vers le texte (cast_chunk).
+    """
+    dtypes = {}
+    for column, dtype in chunk.dtypes.items():
+        if chunk[column].isna().all():
+            # Colonne vide au début du fichier : texte, le seul type qui accepte la suite
+            dtypes[column] = "string"
+        else:
+            dtypes[column] = NULLABLE_DTYPES.get(dtype.kind, "string" if dtype.kind in "OSU" else dtype)
+    return dtypes
+
+def cast_chunk(chunk, dtypes, index):
+    """
+    Applique les types retenus (modifie dtypes). Une colonne qui ne colle plus (ex: "abc" dans une
+    colonne d'entiers) passe en texte pour la suite du fichier, comme si pandas avait tout lu d'un coup ;
+    DLT promeut la colonne en text (DATA_WRITER__ARROW_CONCAT_PROMOTE_OPTIONS, csv_to_clickhouse).
+    """
+    import pandas as pd
+
+    for column, dtype in dtypes.items():
+        if column not in chunk or chunk[column].dtype == dtype:
+            continue
+        try:
+            values = chunk[column]
+            if dtype in ("Int64", "Float64") and values.dtype.kind in "OSU":
+                values = pd.to_numeric(values)
+            chunk[column] = values.astype(dtype)
+        except (ValueError, TypeError):
+            print(f"   ⚠️ Colonne '{column}' : le chunk {index} ne colle pas au type {dtype}, élargie en texte")
+            dtypes[column] = "string"
+            chunk[column] = chunk[column].astype("string")
+    return chunk
+
+def read_csv_chunks(body, mapping, game_id, stats):
+    """Parse le flux S3 au fil de l'eau : jamais plus d'un chunk de DataFrame en mémoire."""
+    import pandas as pd
+
+    dtypes = None
+    for index, chunk in enumerate(pd.read_csv(body, chunksize=CSV_CHUNK_ROWS), start=1):
+        if dtypes is None:
+            dtypes = pin_dtypes(chunk)
+        chunk = transform_chunk(cast_chunk(chunk, dtypes, index), mapping, game_id)
+        stats["rows"] += len(chunk)
+        stats["chunks"] += 1
+        print(f"   📦 Chunk {stats['chunks']} : {stats['rows']} lignes lues")
+        yield chunk
+
+# --- CHEMIN ARROW (types explicites, parse multithreadé, pas d'objets Python) ---
+
+def clickhouse_to_arrow(ch_type):
+    """Type ClickHouse -> type Arrow. None si on préfère laisser Arrow inférer."""
+    import pyarrow as pa
+
+    for wrapper in ("Nullable(", "LowCardinality("):
+        while ch_type.startswith(wrapper):
+            ch_type = ch_type[len(wrapper):-1]
+    simple = {
+        "Int8": pa.int8(), "Int16": pa.int16(), "Int32": pa.int32(), "Int64": pa.int64(),
+        "UInt8": pa.uint8(), "UInt16": pa.uint16(), "UInt32": pa.uint32(), "UInt64": pa.uint64(),
+        "Float32": pa.float32(), "Float64": pa.float64(),
+        "Bool": pa.bool_(), "String": pa.string(), "UUID": pa.string(),
+        "Date": pa.date32(), "Date32": pa.date32(), "DateTime": pa.timestamp("s"),
+    }
+    if ch_type in simple:
+        return simple[ch_type]
+    if ch_type.startswith("DateTime64"):
+        return pa.timestamp("us")
+    if ch_type.startswith(("FixedString", "Enum")):
+        return pa.string()
+    if ch_type.startswith("Decimal"):
+        return pa.float64()
+    return None
+
+def fetch_clickhouse_types(table):
+    """
+    Schéma de la table cible via l'interface HTTP ClickHouse ({} si elle n'existe pas encore :
+    DLT la créera à partir des types Arrow).
+    """
+    import requests
+
+    host = os.getenv("CH_HOST", "lovelace-clickhouse")
+    port = os.getenv("CH_PORT", "8123")
+    database = os.getenv("CH_DB", "default")
+    try:
+        r = requests.post(
+            f"http://{host}:{port}/",
+            params={"query": f"DESCRIBE TABLE `{database}`.`{table}` FORMAT JSON"},
+            headers={"X-ClickHouse-User": os.getenv("CH_USER", "default"),
+                     "X-ClickHouse-Key": os.getenv("CH_PASSWORD", "")},
+            timeout=10
+        )
+        if not r.ok:
+            return {}
+        return {col["name"]: col["type"] for col in r.json().get("data", [])}
+    except requests.RequestException as e:
+        print(f"⚠️ Schéma ClickHouse indisponible ({e}), inférence Arrow")
+        return {}
+
+class PrefixedStream(io.RawIOBase):
+    """Remet devant le flux les octets déjà lus pour l'en-tête (un StreamingBody S3 ne se rembobine pas)."""
+
+    def __init__(self, prefix, body):
+        self._prefix = prefix
+        self._body = body
+
+    def read(self, size=-1):
+        if self._prefix:
+            if size is None or size < 0:
+                data, self._prefix = self._prefix + self._body.read(), b""
+                return data
+            data, self._prefix = self._prefix[:size], self._prefix[size:]
+            if len(data) < size:
+                data += self._body.read(size - len(data))
+            return data
+        return self._body.read() if size is None or size < 0 else self._body.read(size)
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def readable(self):
+        return True
+
+def read_header(body):
+    """Lit la ligne d'en-tête sans la consommer pour le parseur. Renvoie (colonnes, flux complet)."""
+    head = b""
+    while b"\n" not in head:
+        data = body.read(64 * 1024)
+        if not data:
+            break
+        head += data
+    first_line = head.split(b"\n", 1)[0].decode("utf-8-sig").rstrip("\r")
+    columns = next(csv.reader([first_line]), [])
+    return columns, PrefixedStream(head, body)
+
+def arrow_column_types(columns, mapping, types):
+    """Types Arrow par colonne source, à partir des types cibles (MAPPING_JSON ou table ClickHouse)."""
+    column_types = {}
+    for col in columns:
+        target = snake_case(mapping.get(col, col))
+        arrow_type = clickhouse_to_arrow(types[target]) if target in types else None
+        if arrow_type is not None:
+            column_types[col] = arrow_type
+    return column_types
+
+def transform_batch(batch, mapping, game_id):
+    """Équivalent Arrow de transform_chunk : renommage, game_id constant, snake_case."""
+    import pyarrow as pa
+
+    names = [snake_case(mapping.get(c, c)) for c in batch.schema.names]
+    arrays = list(batch.columns)
+    if game_id:
+        arrays.append(pa.array([game_id] * batch.num_rows, type=pa.string()))
+        names.append("game_id")
+    return pa.RecordBatch.from_arrays(arrays, names=names)
+
+def read_csv_arrow(body, mapping, game_id, stats, types=None):
+    """
+    Parse Arrow en flux (blocs de CSV_BLOCK_BYTES, multithreadé) avec des types explicites :
+    aucune colonne objet Python, et DLT reçoit directement des RecordBatch.
+    """
+    import pyarrow.csv as pacsv
+
+    columns, stream = read_header(body)
+    column_types = arrow_column_types(columns, mapping, types or {})
+    if column_types:
+        print(f"   🧬 Types explicites : { {c: str(t) for c, t in column_types.items()} }")
+
+    reader = pacsv.open_csv(
+        stream,
+        read_options=pacsv.ReadOptions(use_threads=True, block_size=CSV_BLOCK_BYTES),
+        convert_options=pacsv.ConvertOptions(column_types=column_types)
+    )
+    for batch in reader:
+        batch = transform_batch(batch, mapping, game_id)
+        stats["rows"] += batch.num_rows
+        stats["chunks"] += 1
+        print(f"   📦 Bloc {stats['chunks']} : {stats['rows']} lignes lues")
+        yield batch
+
+# --- FORMATS : détection, décompression en flux, NDJSON et Parquet ---
+
+def detect_format(key):
+    """
+    ('csv' | 'ndjson' | 'json' | 'parquet', None | 'gzip' | 'zstd') d'après l'extension (ou FILE_FORMAT).
+    'json' (.json) est tranché à la lecture : tableau JSON ou NDJSON (sniff_json).
+    """
+    name = key.lower()
+    compression = None
+    for ext, codec in COMPRESSIONS.items():
+        if name.endswith(ext):
+            compression = codec
+            name = name[:-len(ext)]
+            break
+    fmt = FILE_FORMAT or FORMATS.get(os.path.splitext(name)[1], "csv")
+    return fmt, compression
+
+def decompress(body, compression):
+    """Décompression en flux : on ne matérialise jamais le fichier décompressé."""
+    if compression == "gzip":
+        import gzip
+        return gzip.GzipFile(fileobj=body, mode="rb")
+    if compression == "zstd":
+        import zstandard
+        return zstandard.ZstdDecompressor().stream_reader(body, read_across_frames=True)
+    return body
+
+def read_ndjson(body, mapping, game_id, stats):
+    """NDJSON par chunks de CSV_CHUNK_ROWS lignes (objets imbriqués laissés tels quels)."""
+    import pandas as pd
+
+    for chunk in pd.read_json(body, lines=True, chunksize=CSV_CHUNK_ROWS, dtype=False):
+        chunk = transform_chunk(chunk, mapping, game_id)
+        stats["rows"] += len(chunk)
+        stats["chunks"] += 1
+        print(f"   📦 Chunk {stats['chunks']} : {stats['rows']} lignes lues")
+        yield chunk
+
+def sniff_json(stream):
+    """Un .json est un tableau si son premier octet non blanc est '[', sinon du NDJSON. Renvoie (format, flux complet)."""
+    head = b""
+    while not head.strip():
+        data = stream.read(4096)
+        if not data:
+            break
+        head += data
+    fmt = "json_array" if head.lstrip()[:1] == b"[" else "ndjson"
+    return fmt, PrefixedStream(head, stream)
+
+def read_json_array(body, mapping, game_id, stats):
+    """Tableau JSON classique : pas de lecture en flux possible, chargé en une fois puis rendu par chunks."""
+    import pandas as pd
+
+    df = pd.read_json(body, dtype=False)
+    for start in range(0, len(df), CSV_CHUNK_ROWS):
+        chunk = transform_chunk(df.iloc[start:start + CSV_CHUNK_ROWS].copy(), mapping, game_id)
+        stats["rows"] += len(chunk)
+        stats["chunks"] += 1
+        print(f"   📦 Chunk {stats['chunks']} : {stats['rows']} lignes lues")
+        yield chunk
+
+def read_parquet(source, mapping, game_id, stats):
+    """
+    Parquet lu par batches de CSV_CHUNK_ROWS lignes (indépendants des row groups). Avec un mapping,
+    seules les colonnes mappées sont décodées ; les types viennent du fichier, pas d'inférence.
+    """
+    import pyarrow.parquet as pq
+
+    parquet = pq.ParquetFile(source)
+    columns = [c for c in parquet.schema_arrow.names if c in mapping] if mapping else None
+    if columns is not None:
+        print(f"   🧬 Colonnes décodées : {columns}")
+    for batch in parquet.iter_batches(batch_size=CSV_CHUNK_ROWS, columns=columns):
+        batch = transform_batch(batch, mapping, game_id)
+        stats["rows"] += batch.num_rows
+        stats["chunks"] += 1
+        print(f"   📦 Batch {stats['chunks']} : {stats['rows']} lignes lues")
+        yield batch
+
+def read_file(body, key, engine, mapping, game_id, stats, types=None):
+    """
+    Point d'entrée commun : choisit le lecteur selon l'extension de la clé. Le Parquet
+    exige un fichier seekable (chemin local), les autres formats se lisent en flux.
+    """
+    fmt, compression = detect_format(key)
+    if fmt == "parquet":
+        if compression:
+            raise ValueError(f"❌ Parquet compressé en {compression} non supporté : {key}")
+        return read_parquet(body, mapping, game_id, stats)
+
+    stream = decompress(body, compression)
+    if fmt == "json":
+        fmt, stream = sniff_json(stream)
+        if fmt == "json_array":
+            return read_json_array(stream, mapping, game_id, stats)
+    if fmt == "ndjson":
+        return read_ndjson(stream, mapping, game_id, stats)
+    if engine == "arrow":
+        return read_csv_arrow(stream, mapping, game_id, stats, types)
+    return read_csv_chunks(stream, mapping, game_id, stats)
+
+# --- MULTI-FICHIERS : parse dans un pool de processus, relu dans l'ordre par le parent ---
+
+def text_widened(schema, chunk_schema):
+    """Champs du chunk passés en texte alors que le schéma retenu les typait autrement."""
+    import pyarrow as pa
+
+    def is_text(arrow_type):
+        return pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type)
+
+    return [
+        field for field in chunk_schema
+        if field.name in schema.names and is_text(field.type) and not is_text(schema.field(field.name).type)
+    ]
+
+def widen_spill(writer, out_path, schema):
+    """Colonne élargie en cours de fichier : réécrit les batches déjà posés au nouveau schéma (cas rare)."""
+    import pyarrow as pa
+
+    writer.close()
+    old_path = out_path + ".old"
+    os.replace(out_path, old_path)
+    writer = pa.ipc.new_file(out_path, schema)
+    with pa.OSFile(old_path, "rb") as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            writer.write_batch(reader.get_batch(i).cast(schema))
+    os.remove(old_path)
+    return writer
+
+def spill_file(path, out_path, engine, mapping, game_id, types=None):
+    """
+    Exécuté dans un processus du pool : parse un fichier local et l'écrit en Arrow IPC
+    (out_path). Le parent relit ces fichiers dans l'ordre des clés, pour DLT.
+    """
+    import pandas as pd
+    import pyarrow as pa
+
+    stats = {"rows": 0, "chunks": 0}
+    writer = schema = None
+    with open(path, "rb") as body:
+        batches = read_file(body, path, engine, mapping, game_id, stats, types)
+        try:
+            for batch in batches:
+                if isinstance(batch, pd.DataFrame):
+                    # Schéma du premier chunk imposé aux suivants, sauf colonne élargie en texte par cast_chunk
+                    if schema is not None:
+                        widened = text_widened(schema, pa.Schema.from_pandas(batch, preserve_index=False))
+                        if widened:
+                            for field in widened:
+                                schema = schema.set(schema.get_field_index(field.name), field)
+                            writer = widen_spill(writer, out_path, schema)
+                    batch = pa.RecordBatch.from_pandas(batch, schema=schema, preserve_index=False)
+                if writer is None:
+                    schema = batch.schema
+                    writer = pa.ipc.new_file(out_path, schema)
+                writer.write_batch(batch)
+        finally:
+            if writer is not None:
+                writer.close()
+    os.remove(path)
+    return stats
+
+def read_spilled(out_path):
+    """Relit un fichier produit par spill_file, batch par batch, puis le supprime."""
+    import pyarrow as pa
+
+    if not os.path.exists(out_path):
+        return
+    # OSFile (copie) plutôt que memory_map : DLT peut garder des batches après la fermeture
+    with pa.OSFile(out_path, "rb") as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            yield reader.get_batch(i)
+    os.remove(out_path)
@@ -0,0 +1,185 @@
+"""Client asynchrone partagé pour l'API Zyte (/v1/extract)."""
+import os
+import sys
+import time
+import base64
+import asyncio
+import contextvars
+import httpx
+from lovelace import metrics
+from lovelace.cache import ZyteCache, with_validators
+from lovelace.ratelimit import RetryPolicy, TokenBucket, parse_retry_after
+
+ZYTE_API_URL = os.getenv("ZYTE_API_URL", "https://api.zyte.com/v1/extract")
+ZYTE_MAX_IN_FLIGHT = int(os.getenv("ZYTE_MAX_IN_FLIGHT", "8"))
+ZYTE_RATE_LIMIT = float(os.getenv("ZYTE_RATE_LIMIT", "500"))            # requêtes/minute pour le compte
+ZYTE_MAX_RETRY_TIME = float(os.getenv("ZYTE_MAX_RETRY_TIME", "120"))    # secondes de retry max par item
+
+# Échéance de retry partagée par tous les appels Zyte de l'item courant (voir start_item)
+_item_budget = contextvars.ContextVar("lovelace_zyte_item_budget", default=None)
+
+def start_item():
+    """
+    Ouvre le budget de retry de l'item courant (au début de la tâche asyncio qui le traite, comme
+    metrics.track_item) : tous ses appels Zyte, y compris dans les tâches qu'il lance (gather),
+    partagent une seule échéance de max_retry_time, armée à sa première requête.
+    """
+    _item_budget.set({})
+
+class ZyteError(Exception):
+    """Réponse non-2xx de l'API Zyte (ban, quota, URL invalide...)"""
+    def __init__(self, status_code, message=""):
+        super().__init__(f"Zyte {status_code}: {message}" if message else f"Zyte {status_code}")
+        self.status_code = status_code
+
+class ZyteClient:
+    """
+    Une seule session HTTP/2 keep-alive vers Zyte, partagée par tous les scrapes du process.
+    Le sémaphore borne le nombre de requêtes en vol : un batch de N slugs prend
+    ~ N / max_in_flight requêtes de latence au lieu de N.
+    Un token bucket applique le budget du compte, et les 429/5xx sont rejoués
+    avec backoff (Retry-After respecté) dans la limite de `max_retry_time` par item
+    (start_item ; par appel pour un appel hors item).
+    Si ZYTE_CACHE_DIR est défini, les pages des sites de scores passent par le cache disque.
+    """
+
+    def __init__(self, api_key=None, max_in_flight=None, timeout=30, api_url=None,
+                 rate_limit=None, retry_policy=None, cache=None):
+        self.api_key = api_key if api_key is not None else os.getenv("ZYTE_API_KEY")
+        self.api_url = api_url or ZYTE_API_URL
+        self.max_in_flight = max_in_flight or ZYTE_MAX_IN_FLIGHT
+        self.timeout = timeout
+        self.retry_policy = retry_policy or RetryPolicy(max_retry_time=ZYTE_MAX_RETRY_TIME)
+        self.cache = cache if cache is not None else ZyteCache.from_env()
+        self._bucket = TokenBucket((rate_limit or ZYTE_RATE_LIMIT) / 60, burst=self.max_in_flight)
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._http = httpx.AsyncClient(
+            auth=(self.api_key or "", ""),
+            http2=True,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_in_flight,
+                max_keepalive_connections=self.max_in_flight
+            )
+        )
+        # Où passe le temps : file d'attente (slot + budget), réseau, ou backoff entre retries
+        self.stats = {
+            "requests": 0,
+            "retries": 0,
+            "queue_wait_s": 0.0,
+            "wire_s": 0.0,
+            "backoff_s": 0.0
+        }
+
+    async def extract(self, payload, timeout=None):
+        """POST /v1/extract et renvoie le JSON Zyte. `timeout` surcharge le défaut (ex: 60s pour browserHtml)."""
+        with metrics.timer("fetch"):
+            return await self._extract(payload, timeout)
+
+    async def _extract(self, payload, timeout=None):
+        if not self.cache or not self.cache.cacheable(payload):
+            return await self._send(payload, timeout)
+
+        cached = self.cache.lookup(payload)
+        if cached and cached[1]:
+            return cached[0]
+        if self.cache.mode == "offline":
+            raise ZyteError(504, f"absent du cache (mode offline): {payload.get('url')}")
+
+        request = payload
+        if payload.get("httpResponseBody"):
+            # On récupère les en-têtes pour stocker ETag/Last-Modified
+            request = {**payload, "httpResponseHeaders": True}
+            if cached:
+                request = with_validators(request, cached[2])
+
+        data = await self._send(request, timeout)
+        if cached and data.get("statusCode") == 304:
+            self.cache.touch(payload)
+            return cached[0]
+
+        self.cache.store(payload, data)
+        return data
+
+    async def _send(self, payload, timeout=None):
+        budget = _item_budget.get()
+        if budget is None:
+            deadline = time.monotonic() + self.retry_policy.max_retry_time
+        else:
+            # OpenCritic api+static+browser, Epic page+GraphQL... : un seul budget pour l'item
+            deadline = budget.setdefault("deadline", time.monotonic() + self.retry_policy.max_retry_time)
+        attempt = 0
+
+        while True:
+            queued_at = time.monotonic()
+            async with self._semaphore:
+                await self._bucket.acquire()
+                sent_at = time.monotonic()
+                try:
+                    r = await self._http.post(self.api_url, json=payload, timeout=timeout or self.timeout)
+                    status, error = r.status_code, None
+                except httpx.TransportError as e:
+                    r, status, error = None, None, e
+                done_at = time.monotonic()
+
+            self.stats["requests"] += 1
+            self.stats["queue_wait_s"] += sent_at - queued_at
+            self.stats["wire_s"] += done_at - sent_at
+
+            if error is None and status < 400:
+                return r.json()
+
+            if not self.retry_policy.should_retry(status):
+                raise ZyteError(status, r.text[:200])
+
+            retry_after = parse_retry_after(r.headers.get("Retry-After")) if r is not None else None
+            delay = self.retry_policy.delay(attempt, retry_after)
+            if done_at + delay > deadline:
+                # Budget de retry épuisé : on libère le worker plutôt que de s'acharner
+                if error is not None:
+                    raise error
+                raise ZyteError(status, r.text[:200])
+
+            self.stats["retries"] += 1
+            self.stats["backoff_s"] += delay
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def summary(self):
+        """Ligne de stats lisible pour stderr (stdout reste réservé au JSON)."""
+        st = self.stats
+        line = (f"📊 Zyte: {st['requests']} requêtes, {st['retries']} retries | "
+                f"file {st['queue_wait_s']:.1f}s, réseau {st['wire_s']:.1f}s, backoff {st['backoff_s']:.1f}s")
+        if self.cache:
+            line += "\n" + self.cache.summary()
+        return line
+
+    async def aclose(self):
+        await self._http.aclose()
+        if self.cache:
+            self.cache.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+def decode_body(data):
+    """Décode le httpResponseBody (base64) d'une réponse Zyte en bytes."""
+    body = data.get("httpResponseBody")
+    if not body:
+        return None
+    with metrics.timer("decode"):
+        return base64.b64decode(body)
+
+def run_sync(scrape_fn, *args, **client_kwargs):
+    """Exécute un scrape async isolé (mode CLI un seul slug) avec son propre client."""
+    async def main():
+        async with ZyteClient(**client_kwargs) as client:
+            start_item()
+            try:
+                return await scrape_fn(client, *args)
+            finally:
+                print(client.summary(), file=sys.stderr)
+    return asyncio.run(main())
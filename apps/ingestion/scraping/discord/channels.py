@@ -1,16 +1,17 @@
 import os
 import sys
 import json
+import asyncio
+import hashlib
 import dlt
 import discord
-import asyncio
-from datetime import datetime
-from typing import Any, Dict, Iterator, Iterable
-from kafka import KafkaProducer
+from typing import Any, Dict, Iterable, List
+from lovelace import metrics, producer, profiling
+from lovelace.aiobridge import iter_async_chunks
+from lovelace.serializers import get_serializer
 
 # --- CONFIGURATION ---
 DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
-KAFKA_BROKERS = os.getenv("KAFKA_BROKERS", "localhost:19092")
 KAFKA_TOPIC = "ingestion_channels"
 
 # Metadata Lovelace pour le pipeline Connect
@@ -18,27 +19,29 @@ GAME_ID = os.getenv("GAME_ID")
 STEP_SLUG = os.getenv("STEP_SLUG")
 WORKFLOW_ID = os.getenv("WORKFLOW_ID")
 
-if not DISCORD_TOKEN:
-    print(json.dumps({"error": "DISCORD_TOKEN manquante"}))
-    sys.exit(1)
+# Compteurs par guild pour le JSON final (Kestra lit "count")
+guild_counts: Dict[str, int] = {}
+guild_errors: Dict[str, str] = {}
 
-# Discord Client
-intents = discord.Intents.default()
-client = discord.Client(intents=intents)
+# Seuls les salons créés / modifiés / supprimés repartent vers Kafka. L'état précédent est relu
+# dans platform_channels (Postgres, DB_URL) : c'est ce que Connect a écrit aux runs précédents.
+# Sans DB_URL, tout est publié comme créé. CHANNELS_FULL_SYNC=1 republie tout.
+DB_URL = os.getenv("DB_URL")
+DISCORD_PLATFORM_SLUG = "discord"
+FULL_SYNC = os.getenv("CHANNELS_FULL_SYNC", "").lower() in ("1", "true", "yes")
+guild_changes: Dict[str, Dict[str, int]] = {}
+
+# Même table que connect/mappings/discord_channels.blobl (platform_channels.type)
+CHANNEL_TYPES = {0: "GUILD_TEXT", 2: "GUILD_VOICE", 4: "GUILD_CATEGORY", 5: "GUILD_ANNOUNCEMENT",
+                 13: "GUILD_STAGE_VOICE", 15: "GUILD_FORUM"}
 
 # --- CUSTOM DESTINATION : KAFKA (Style Backfill) ---
-def json_serializer(obj):
-    if isinstance(obj, (datetime,)):
-        return obj.isoformat()
-    raise TypeError(f"Type {type(obj)} not serializable")
+# Encodage des messages (json / orjson / avro) : voir lovelace.serializers
+serialize = get_serializer(KAFKA_TOPIC)
 
-@dlt.destination(batch_size=100, name="redpanda")
+@dlt.destination(batch_size=producer.DLT_BATCH_SIZE, name="redpanda")
 def kafka_destination(items: Iterable[Dict[str, Any]], table_schema: Any) -> None:
-    producer = KafkaProducer(
-        bootstrap_servers=KAFKA_BROKERS,
-        value_serializer=lambda v: json.dumps(v, default=json_serializer).encode('utf-8')
-    )
-
+    # Producer partagé du process : le flush se fait une seule fois en fin de pipeline
     for item in items:
         # Enveloppe Lovelace pour le mapping universel dans Connect
         message = {
@@ -51,48 +54,164 @@ def kafka_destination(items: Iterable[Dict[str, Any]], table_schema: Any) -> Non
         }
         # On utilise l'ID Discord comme clé Kafka
         key = str(item.get("id", "")).encode('utf-8')
-        producer.send(KAFKA_TOPIC, key=key, value=message)
-    
-    producer.flush()
+        with metrics.timer("serialize"):
+            value = serialize(message)
+        producer.send(KAFKA_TOPIC, key, value)
 
 # --- EXTRACTION ---
-async def fetch_channels(guild_id: int):
-    await client.login(DISCORD_TOKEN)
+def channel_record(guild_id: int, ch) -> Dict[str, Any]:
+    return {
+        "id": str(ch.id),
+        "guild_id": str(guild_id),
+        "name": ch.name,
+        "type": ch.type.value,
+        "parent_id": str(ch.category_id) if ch.category_id else None,
+        "position": ch.position,
+        "nsfw": getattr(ch, 'nsfw', False),
+        "topic": getattr(ch, 'topic', None)
+    }
+
+def stored_form(record: Dict[str, Any]) -> list:
+    """Les champs tels que le mapping Connect les range dans platform_channels (name, type, metadata)."""
+    return [
+        record.get("name"),
+        CHANNEL_TYPES.get(record.get("type"), "UNKNOWN"),
+        record.get("topic") or "",
+        record.get("parent_id"),
+        record.get("position") or 0,
+        bool(record.get("nsfw")),
+        record.get("guild_id")
+    ]
+
+def fingerprint(fields: list) -> str:
+    payload = json.dumps(fields, separators=(",", ":"))
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=8).hexdigest()
+
+def load_known_channels(guild_ids: List[int]) -> Dict[str, Dict[str, tuple]]:
+    """
+    Salons actifs des guilds du run dans platform_channels, en une requête :
+    guild_id -> {external_id: (empreinte, supprimable)}.
+    Les lignes écrites avant l'ajout de guild_id dans metadata comptent pour la comparaison
+    de chaque guild (leur empreinte diffère, elles sont republiées une fois avec guild_id)
+    mais ne reçoivent de tombstone que si le run ne couvre qu'une guild.
+    """
+    known = {str(guild_id): {} for guild_id in guild_ids}
+    if not DB_URL or not GAME_ID:
+        return known
+    import psycopg2
+    conn = psycopg2.connect(DB_URL)
     try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT pc.external_id, pc.name, pc.type, pc.metadata
+                FROM platform_channels pc
+                JOIN game_platforms gp ON gp.id = pc.game_platform_id
+                JOIN platforms p ON p.id = gp.platform_id
+                WHERE gp.game_id = %s AND p.slug = %s AND pc.is_active
+                  AND (pc.metadata->>'guild_id' = ANY(%s) OR pc.metadata->>'guild_id' IS NULL)
+            """, (GAME_ID, DISCORD_PLATFORM_SLUG, list(known)))
+            rows = cur.fetchall()
+    finally:
+        conn.close()
+
+    single_guild = len(known) == 1
+    for external_id, name, type_name, metadata in rows:
+        metadata = metadata or {}
+        guild_id = metadata.get("guild_id")
+        fields = [name, type_name, metadata.get("topic") or "", metadata.get("parent_id"),
+                  metadata.get("position") or 0, bool(metadata.get("nsfw")), guild_id]
+        state = (fingerprint(fields), single_guild or guild_id is not None)
+        for guild in ([str(guild_id)] if guild_id is not None else list(known)):
+            if guild in known:
+                known[guild][external_id] = state
+    return known
+
+def diff_channels(guild_id: int, records: List[Dict[str, Any]], known: Dict[str, tuple]) -> List[Dict[str, Any]]:
+    """
+    Compare à l'état connu (load_known_channels) : renvoie les salons créés ou modifiés
+    (champ "change") et une tombstone par salon disparu.
+    """
+    current = set()
+    changes = []
+    counts = {"created": 0, "changed": 0, "deleted": 0, "unchanged": 0}
+    for record in records:
+        current.add(record["id"])
+        previous = known.get(record["id"])
+        if previous is None:
+            change = "created"
+        else:
+            change = "changed" if previous[0] != fingerprint(stored_form(record)) else None
+        counts[change or "unchanged"] += 1
+        if change or FULL_SYNC:
+            changes.append({**record, "change": change or "unchanged"})
+
+    for channel_id, (_, deletable) in known.items():
+        if channel_id not in current and deletable:
+            counts["deleted"] += 1
+            changes.append({"id": channel_id, "guild_id": str(guild_id), "change": "deleted"})
+
+    guild_changes[str(guild_id)] = counts
+    return changes
+
+async def fetch_guild_channels(client: discord.Client, guild_id: int):
+    with metrics.timer("fetch"):
         guild = await client.fetch_guild(guild_id)
         channels = await guild.fetch_channels()
-        
-        results = []
-        for ch in channels:
-            results.append({
-                "id": str(ch.id),
-                "name": ch.name,
-                "type": ch.type.value,
-                "parent_id": str(ch.category_id) if ch.category_id else None,
-                "position": ch.position,
-                "nsfw": getattr(ch, 'nsfw', False),
-                "topic": getattr(ch, 'topic', None)
-            })
-        return results
+    return guild_id, [channel_record(guild_id, ch) for ch in channels]
+
+async def fetch_channels(guild_ids: List[int]):
+    # Un seul login pour toutes les guilds, listes de salons récupérées en parallèle
+    client = discord.Client(intents=discord.Intents.default())
+    await client.login(DISCORD_TOKEN)
+    if not DB_URL:
+        print("⚠️  DB_URL absent : état précédent inconnu, tous les salons sont publiés", file=sys.stderr)
+    try:
+        tasks = [asyncio.create_task(fetch_guild_channels(client, g)) for g in guild_ids]
+        # psycopg2 est bloquant : platform_channels lu hors de la boucle, une fois pour toutes les guilds,
+        # pendant que les fetchs tournent
+        with metrics.timer("diff"):
+            known_by_guild = await asyncio.to_thread(load_known_channels, guild_ids)
+        for guild_id, task in zip(guild_ids, tasks):
+            try:
+                _, records = await task
+            except Exception as e:
+                # Erreur HTTP, transport ou timeout : seule cette guild est en échec
+                guild_errors[str(guild_id)] = f"{type(e).__name__}: {e}"
+                continue
+            with metrics.timer("diff"):
+                changes = diff_channels(guild_id, records, known_by_guild[str(guild_id)])
+            guild_counts[str(guild_id)] = len(changes)
+            for record in changes:
+                yield record
     finally:
         await client.close()
 
 @dlt.resource(name="discord_channels", write_disposition="replace")
-def discord_resource(guild_id: int):
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    channels = loop.run_until_complete(fetch_channels(guild_id))
-    # On stocke le count pour le print final
-    os.environ["TOTAL_CHANNELS_COUNT"] = str(len(channels))
-    yield channels
+def discord_resource(guild_ids: List[int]):
+    # Fetch sur une boucle asyncio dédiée (thread), consommé ici par pages
+    for chunk in iter_async_chunks(lambda: fetch_channels(guild_ids), chunk_size=100):
+        yield chunk
+
+def parse_guilds(args: List[str]) -> List[int]:
+    """
+    Guilds en arguments : `123 456` ou `123,456`. Toutes appartiennent au jeu GAME_ID : la
+    progression d'onboarding (totalItems) est suivie pour ce seul jeu.
+    """
+    return [int(part.strip()) for arg in args for part in arg.split(",") if part.strip()]
 
 if __name__ == "__main__":
+    profiling.install("discord_channels")
+
+    if not DISCORD_TOKEN:
+        print(json.dumps({"error": "DISCORD_TOKEN manquante"}))
+        sys.exit(1)
+
     if len(sys.argv) < 2:
         print(json.dumps({"error": "Missing guildId argument"}))
         sys.exit(1)
         
     try:
-        guild_id = int(sys.argv[1])
+        guild_ids = parse_guilds(sys.argv[1:])
     except ValueError:
         print(json.dumps({"error": "guildId must be an integer"}))
         sys.exit(1)
@@ -103,11 +222,22 @@ if __name__ == "__main__":
         destination=kafka_destination
     )
 
-    info = pipeline.run(discord_resource(guild_id))
+    with metrics.timer("pipeline"):
+        info = pipeline.run(discord_resource(guild_ids))
+    producer.close()
     
-    # On renvoie le count à Kestra sur stdout
+    # On renvoie le count à Kestra sur stdout : messages émis (total + détail par guild),
+    # c'est ce que le pipeline Connect comptera en progression. À 0 (aucun changement),
+    # aucun message n'arrive à Connect : le flow clôt l'étape lui-même.
     print(json.dumps({
-        "status": "success",
-        "count": int(os.getenv("TOTAL_CHANNELS_COUNT", "0")),
+        "status": "partial" if guild_errors else "success",
+        "count": sum(guild_counts.values()),
+        "guilds": guild_counts,
+        "changes": guild_changes,
+        "errors": guild_errors,
+        "timings": metrics.timings(),
         "load_info": str(info)
-    }))
\ No newline at end of file
+    }))
+    metrics.export("discord_channels")
+    if guild_errors and not guild_counts:
+        sys.exit(1)
@@ -1,18 +1,164 @@
 import os
 import sys
 import json
-import argparse
-import requests
-import base64
 import re
+import asyncio
+import threading
+from lovelace import metrics
+from lovelace.batch import run_cli
+from lovelace.store import StateStore
+from lovelace.zyte import ZyteError, decode_body, run_sync
 
-def scrape_epic_games(slug):
-    zyte_api_key = os.getenv("ZYTE_API_KEY")
-    if not zyte_api_key:
-        return {"slug": slug, "error": "ZYTE_API_KEY manquante"}
+# Slug de la plateforme Epic dans la table `platforms` (write-back optionnel du sandboxId)
+EPIC_PLATFORM_SLUG = os.getenv("EPIC_PLATFORM_SLUG", "epic")
+
+_sandbox_store = None
+_store_lock = threading.Lock()
+_db_conn = None
+_db_lock = threading.Lock()
+
+def get_sandbox_store():
+    """
+    Index persistant slug -> sandboxId (il ne change quasiment jamais pour un produit), dans Postgres avec DB_URL.
+    Best-effort : base injoignable -> None, on passe par la page produit.
+    """
+    global _sandbox_store
+    # Appelée depuis les threads de asyncio.to_thread : la connexion ne bloque pas la boucle
+    with _store_lock:
+        if _sandbox_store is None:
+            try:
+                _sandbox_store = StateStore("epic_sandbox_ids")
+            except Exception as e:
+                print(f"⚠️ Index sandboxId indisponible, résolution par la page produit: {e}", file=sys.stderr)
+                # Pas de nouvelle tentative de connexion pour chaque slug du batch
+                _sandbox_store = False
+    return _sandbox_store or None
+
+def get_db():
+    """Connexion Postgres si DB_URL est fourni et joignable, sinon None (le write-back est optionnel)."""
+    global _db_conn
+    # Une seule connexion (ou un seul échec) pour le process
+    with _db_lock:
+        if _db_conn is None and os.getenv("DB_URL"):
+            try:
+                import psycopg2
+                _db_conn = psycopg2.connect(os.getenv("DB_URL"))
+                _db_conn.autocommit = True
+            except Exception as e:
+                print(f"⚠️ Postgres injoignable, pas de write-back des sandboxId: {e}", file=sys.stderr)
+                _db_conn = False
+    return _db_conn or None
+
+def db_lookup_sandbox_id(slug):
+    conn = get_db()
+    if not conn:
+        return None
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT gp.config->>'sandboxId'
+            FROM game_platforms gp
+            JOIN platforms p ON gp.platform_id = p.id
+            WHERE p.slug = %s AND gp.config->>'slug' = %s AND gp.config ? 'sandboxId'
+            LIMIT 1
+        """, (EPIC_PLATFORM_SLUG, slug))
+        row = cur.fetchone()
+    return row[0] if row else None
+
+def db_store_sandbox_id(slug, sandbox_id):
+    conn = get_db()
+    if not conn:
+        return
+    # Rangé à côté du slug dans la config de l'intégration du jeu
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE game_platforms gp
+            SET config = gp.config || jsonb_build_object('sandboxId', %s::text), updated_at = NOW()
+            FROM platforms p
+            WHERE gp.platform_id = p.id AND p.slug = %s AND gp.config->>'slug' = %s
+              AND gp.config->>'sandboxId' IS DISTINCT FROM %s
+        """, (sandbox_id, EPIC_PLATFORM_SLUG, slug, sandbox_id))
+
+def lookup_sandbox_id(slug):
+    """Index local puis Postgres ; (sandbox_id, source) ou (None, None). Bloquant, ne lève pas."""
+    store = get_sandbox_store()
+    try:
+        sandbox_id = store.get(slug) if store else None
+        if sandbox_id:
+            return sandbox_id, "cache"
+        sandbox_id = db_lookup_sandbox_id(slug)
+        if sandbox_id and store:
+            store.set(slug, sandbox_id)
+    except Exception as e:
+        print(f"⚠️ Lecture du sandboxId de {slug} impossible: {e}", file=sys.stderr)
+        return None, None
+    return (sandbox_id, "db") if sandbox_id else (None, None)
+
+def remember_sandbox_id(slug, sandbox_id):
+    """Range le sandboxId dans l'index et dans game_platforms. Bloquant, ne lève pas : le scrape a déjà réussi."""
+    store = get_sandbox_store()
+    try:
+        if store:
+            store.set(slug, sandbox_id)
+        db_store_sandbox_id(slug, sandbox_id)
+    except Exception as e:
+        print(f"⚠️ Write-back du sandboxId de {slug} impossible: {e}", file=sys.stderr)
+
+async def resolve_sandbox_id(client, slug, refresh=False):
+    """
+    Renvoie (sandbox_id, source) avec source = "cache" | "db" | "page".
+    Seul un miss coûte le téléchargement de la page produit. Lève ZyteError si la page est inaccessible.
+    Les accès Postgres (psycopg2, bloquant) passent par un thread pour ne pas figer la boucle du batch ;
+    index et base sont best-effort, une panne retombe sur la page produit.
+    """
+    if not refresh:
+        sandbox_id, source = await asyncio.to_thread(lookup_sandbox_id, slug)
+        if sandbox_id:
+            return sandbox_id, source
+
+    page = await client.extract({
+        "url": f"https://store.epicgames.com/en-US/p/{slug}",
+        "httpResponseBody": True,
+        "geolocation": "US"
+    }, timeout=30)
+    html = decode_body(page).decode("utf-8")
+
+    with metrics.timer("parse"):
+        ns_match = re.search(r'"namespace":"([a-f0-9]{32})"', html) or re.search(r'"sandboxId":"([a-f0-9]{32})"', html)
+    if not ns_match:
+        return None, "page"
+
+    sandbox_id = ns_match.group(1)
+    await asyncio.to_thread(remember_sandbox_id, slug, sandbox_id)
+    return sandbox_id, "page"
+
+async def fetch_product_result(client, sandbox_id):
+    """Appel GraphQL getProductResult. None si l'appel échoue (sandboxId périmé, erreur Zyte...)."""
+    graphql_url = "https://store.epicgames.com/graphql"
+    sha256_hash = "452f59168f3c5dacccc5fa161b5bf13d14e2cee2f6c7075f7f836cf4e695e4d7"
+    
+    vars_json = json.dumps({"sandboxId": sandbox_id, "locale": "en-US"})
+    ext_json = json.dumps({"persistedQuery": {"version": 1, "sha256Hash": sha256_hash}})
+    
+    full_gql_url = f"{graphql_url}?operationName=getProductResult&variables={vars_json}&extensions={ext_json}"
+
+    try:
+        gql = await client.extract({
+            "url": full_gql_url,
+            "httpResponseBody": True
+        }, timeout=30)
+    except ZyteError:
+        return None
+
+    body = decode_body(gql)
+    with metrics.timer("parse"):
+        gql_data = json.loads(body)
+    if gql_data.get("errors"):
+        return None
+    return (gql_data.get("data") or {}).get("RatingsPolls", {}).get("getProductResult") or {}
 
-    api_url = "https://api.zyte.com/v1/extract"
-    product_url = f"https://store.epicgames.com/en-US/p/{slug}"
+async def scrape_epic_games_async(client, slug):
+    if not client.api_key:
+        return {"slug": slug, "error": "ZYTE_API_KEY manquante"}
 
     result = {
         "slug": slug,
@@ -22,44 +168,26 @@ def scrape_epic_games(slug):
     }
 
     try:
-        # --- ÉTAPE 1 : Récupérer le sandboxId ---
-        r_page = requests.post(api_url, auth=(zyte_api_key, ""), json={
-            "url": product_url,
-            "httpResponseBody": True,
-            "geolocation": "US"
-        }, timeout=30)
-        
-        if not r_page.ok:
-            return {"slug": slug, "error": f"Page access failed: {r_page.status_code}"}
+        # --- ÉTAPE 1 : Récupérer le sandboxId (index local, sinon page produit) ---
+        try:
+            sandbox_id, source = await resolve_sandbox_id(client, slug)
+        except ZyteError as e:
+            return {"slug": slug, "error": f"Page access failed: {e.status_code}"}
 
-        html = base64.b64decode(r_page.json()["httpResponseBody"]).decode("utf-8")
-        
-        ns_match = re.search(r'"namespace":"([a-f0-9]{32})"', html) or re.search(r'"sandboxId":"([a-f0-9]{32})"', html)
-            
-        if not ns_match:
+        if not sandbox_id:
             return {"slug": slug, "error": "sandboxId not found"}
-            
-        sandbox_id = ns_match.group(1)
-        result["sandbox_id"] = sandbox_id
 
         # --- ÉTAPE 2 : Appel GraphQL ---
-        graphql_url = "https://store.epicgames.com/graphql"
-        sha256_hash = "452f59168f3c5dacccc5fa161b5bf13d14e2cee2f6c7075f7f836cf4e695e4d7"
-        
-        vars_json = json.dumps({"sandboxId": sandbox_id, "locale": "en-US"})
-        ext_json = json.dumps({"persistedQuery": {"version": 1, "sha256Hash": sha256_hash}})
-        
-        full_gql_url = f"{graphql_url}?operationName=getProductResult&variables={vars_json}&extensions={ext_json}"
-
-        r_gql = requests.post(api_url, auth=(zyte_api_key, ""), json={
-            "url": full_gql_url,
-            "httpResponseBody": True
-        }, timeout=30)
+        polls_data = await fetch_product_result(client, sandbox_id)
+        if polls_data is None and source != "page":
+            # sandboxId mémorisé peut-être périmé : on relit la page une fois
+            print(f"DEBUG: GraphQL failed with cached sandboxId for {slug}, refreshing...", file=sys.stderr)
+            sandbox_id, source = await resolve_sandbox_id(client, slug, refresh=True)
+            if sandbox_id:
+                polls_data = await fetch_product_result(client, sandbox_id)
 
-        if r_gql.ok:
-            gql_data = json.loads(base64.b64decode(r_gql.json()["httpResponseBody"]))
-            polls_data = gql_data.get("data", {}).get("RatingsPolls", {}).get("getProductResult", {})
-            
+        result["sandbox_id"] = sandbox_id
+        if polls_data:
             result["epic_rating"] = polls_data.get("averageRating")
             
             poll_results = polls_data.get("pollResult", [])
@@ -77,8 +205,20 @@ def scrape_epic_games(slug):
     except Exception as e:
         return {"slug": slug, "error": str(e)}
 
+async def resolve_sandbox_id_async(client, slug):
+    """Mode --resolve-only : résout (et indexe) le sandboxId sans appeler GraphQL, pour les jeux fraîchement onboardés."""
+    try:
+        sandbox_id, source = await resolve_sandbox_id(client, slug)
+    except ZyteError as e:
+        return {"slug": slug, "error": f"Page access failed: {e.status_code}"}
+    if not sandbox_id:
+        return {"slug": slug, "error": "sandboxId not found"}
+    return {"slug": slug, "sandbox_id": sandbox_id, "source": source}
+
+def scrape_epic_games(slug):
+    return run_sync(scrape_epic_games_async, slug)
+
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser()
-    parser.add_argument('slug')
-    args = parser.parse_args()
-    print(json.dumps(scrape_epic_games(args.slug)))
\ No newline at end of file
+    run_cli(scrape_epic_games_async, modes={
+        "--resolve-only": (resolve_sandbox_id_async, "Résout seulement les sandboxId (index local + Postgres si DB_URL)")
+    })
@@ -1,17 +1,16 @@
-import os
-import sys
-import json
-import argparse
-import requests
-import base64
-from parsel import Selector
+from lovelace.batch import run_cli
+from lovelace.html import extract
+from lovelace.zyte import decode_body, run_sync
 
-def scrape_ign_score(slug):
-    zyte_api_key = os.getenv("ZYTE_API_KEY")
-    if not zyte_api_key:
+IGN_MARKERS = ("review-score",)
+
+def read_ign_score(sel):
+    return sel.css('figure[data-cy="review-score"] figcaption ::text').get()
+
+async def scrape_ign_score_async(client, slug):
+    if not client.api_key:
         return {"slug": slug, "ign_rating": None, "error": "ZYTE_API_KEY manquante"}
 
-    api_url = "https://api.zyte.com/v1/extract"
     target_url = f"https://www.ign.com/games/{slug}"
 
     # On utilise httpResponseBody (statique) au lieu de browserHtml (navigateur lourd)
@@ -23,19 +22,14 @@ def scrape_ign_score(slug):
     }
 
     try:
-        r = requests.post(api_url, auth=(zyte_api_key, ""), json=payload, timeout=30)
-        r.raise_for_status()
-        
-        res_json = r.json()
+        res_json = await client.extract(payload, timeout=30)
         # httpResponseBody est encodé en base64
-        html_b64 = res_json.get("httpResponseBody")
-        if not html_b64:
+        body = decode_body(res_json)
+        if not body:
             return {"slug": slug, "ign_rating": None, "error": "Pas de corps HTTP"}
             
-        html = base64.b64decode(html_b64).decode("utf-8")
-        sel = Selector(text=html)
-        
-        score_text = sel.css('figure[data-cy="review-score"] figcaption ::text').get()
+        html = body.decode("utf-8")
+        score_text = extract(html, read_ign_score, markers=IGN_MARKERS)
 
         if score_text:
             score_text = score_text.strip()
@@ -55,8 +49,8 @@ def scrape_ign_score(slug):
     except Exception as e:
         return {"slug": slug, "ign_rating": None, "error": str(e)}
 
+def scrape_ign_score(slug):
+    return run_sync(scrape_ign_score_async, slug)
+
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser()
-    parser.add_argument('slug')
-    args = parser.parse_args()
-    print(json.dumps(scrape_ign_score(args.slug)))
+    run_cli(scrape_ign_score_async)
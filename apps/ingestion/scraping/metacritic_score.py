@@ -1,11 +1,7 @@
-import os
-import sys
-import json
-import argparse
-import requests
-import base64
 import re
-from parsel import Selector
+from lovelace.batch import run_cli
+from lovelace.html import extract
+from lovelace.zyte import decode_body, run_sync
 
 def extract_digits(text):
     if not text: return None
@@ -21,12 +17,33 @@ def extract_pct(area, sentiment):
             return float(match.group(1))
     return None
 
-def scrape_metacritic(slug):
-    zyte_api_key = os.getenv("ZYTE_API_KEY")
-    if not zyte_api_key:
+# Le bloc de scores porte ces data-testid : sans eux, pas la peine de parser la page
+METACRITIC_MARKERS = ("critic-score-info", "user-score-info")
+
+def read_score_area(sel, testid):
+    """Valeurs brutes d'un bloc de score (critique ou joueurs), None si le bloc est absent."""
+    area = sel.css(f'div[data-testid="{testid}"]')
+    if not area:
+        return None
+    return {
+        "score_text": area.css('.c-productScoreInfo_scoreNumber span::text').get(),
+        "count": extract_digits(area.css('.c-productScoreInfo_reviewsTotal ::text').get()),
+        "positive_pct": extract_pct(area, "positive"),
+        "neutral_pct": extract_pct(area, "neutral"),
+        "negative_pct": extract_pct(area, "negative")
+    }
+
+def read_metacritic(sel):
+    areas = {
+        "critic": read_score_area(sel, "critic-score-info"),
+        "user": read_score_area(sel, "user-score-info")
+    }
+    return areas if any(areas.values()) else None
+
+async def scrape_metacritic_async(client, slug):
+    if not client.api_key:
         return {"slug": slug, "error": "ZYTE_API_KEY manquante"}
 
-    api_url = "https://api.zyte.com/v1/extract"
     target_url = f"https://www.metacritic.com/game/{slug}/"
 
     result = {
@@ -44,52 +61,51 @@ def scrape_metacritic(slug):
     }
 
     try:
-        r = requests.post(api_url, auth=(zyte_api_key, ""), json={
+        data = await client.extract({
             "url": target_url,
             "httpResponseBody": True,
             "geolocation": "US"
         }, timeout=30)
-        r.raise_for_status()
         
-        html = base64.b64decode(r.json().get("httpResponseBody")).decode("utf-8")
-        sel = Selector(text=html)
+        html = decode_body(data).decode("utf-8")
+        areas = extract(html, read_metacritic, markers=METACRITIC_MARKERS) or {}
 
         # A. CRITIC SCORE
-        critic_area = sel.css('div[data-testid="critic-score-info"]')
+        critic_area = areas.get("critic")
         if critic_area:
-            score_text = critic_area.css('.c-productScoreInfo_scoreNumber span::text').get()
+            score_text = critic_area["score_text"]
             if score_text and score_text.strip().isdigit():
                 result["metascore"] = int(score_text.strip())
             
-            result["critic_reviews_count"] = extract_digits(critic_area.css('.c-productScoreInfo_reviewsTotal ::text').get())
+            result["critic_reviews_count"] = critic_area["count"]
             
             # Récupération des parts (graph)
-            result["metascore_positive_pct"] = extract_pct(critic_area, "positive")
-            result["metascore_neutral_pct"] = extract_pct(critic_area, "neutral")
-            result["metascore_negative_pct"] = extract_pct(critic_area, "negative")
+            result["metascore_positive_pct"] = critic_area["positive_pct"]
+            result["metascore_neutral_pct"] = critic_area["neutral_pct"]
+            result["metascore_negative_pct"] = critic_area["negative_pct"]
 
         # B. USER SCORE
-        user_area = sel.css('div[data-testid="user-score-info"]')
+        user_area = areas.get("user")
         if user_area:
-            score_text = user_area.css('.c-productScoreInfo_scoreNumber span::text').get()
+            score_text = user_area["score_text"]
             if score_text and score_text.strip().lower() != 'tbd':
                 try: result["user_score"] = float(score_text.strip())
                 except ValueError: pass
             
-            result["user_ratings_count"] = extract_digits(user_area.css('.c-productScoreInfo_reviewsTotal ::text').get())
+            result["user_ratings_count"] = user_area["count"]
             
             # Récupération des parts (graph)
-            result["user_score_positive_pct"] = extract_pct(user_area, "positive")
-            result["user_score_neutral_pct"] = extract_pct(user_area, "neutral")
-            result["user_score_negative_pct"] = extract_pct(user_area, "negative")
+            result["user_score_positive_pct"] = user_area["positive_pct"]
+            result["user_score_neutral_pct"] = user_area["neutral_pct"]
+            result["user_score_negative_pct"] = user_area["negative_pct"]
 
         return result
 
     except Exception as e:
         return {"slug": slug, "error": str(e)}
 
+def scrape_metacritic(slug):
+    return run_sync(scrape_metacritic_async, slug)
+
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser()
-    parser.add_argument('slug')
-    args = parser.parse_args()
-    print(json.dumps(scrape_metacritic(args.slug)))
\ No newline at end of file
+    run_cli(scrape_metacritic_async)
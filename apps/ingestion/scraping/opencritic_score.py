@@ -1,18 +1,26 @@
 import os
 import sys
 import json
-import argparse
-import requests
-import base64
-from parsel import Selector
+import time
+import asyncio
+import threading
+from lovelace import metrics
+from lovelace.batch import run_cli
+from lovelace.html import extract
+from lovelace.store import StateStore
+from lovelace.zyte import decode_body, run_sync
+
+OPENCRITIC_MARKERS = ("app-open-score",)
+
+def read_player_orb(sel):
+    return "".join(sel.css('app-open-score .inner-orb ::text').getall()).strip() or None
 
 def get_player_data(html):
     """Extrait la note ou le count du HTML fourni"""
     if not html:
         return None, None
     
-    sel = Selector(text=html)
-    player_orb_text = "".join(sel.css('app-open-score .inner-orb ::text').getall()).strip()
+    player_orb_text = extract(html, read_player_orb, markers=OPENCRITIC_MARKERS)
     
     if not player_orb_text:
         return None, None
@@ -31,77 +39,170 @@ def get_player_data(html):
         except ValueError:
             return None, None
 
-def scrape_opencritic(game_id):
-    zyte_api_key = os.getenv("ZYTE_API_KEY")
-    if not zyte_api_key:
-        return {"id": game_id, "error": "ZYTE_API_KEY manquante"}
+# Tous les N runs d'un jeu mémorisé "browser", on retente le statique (la page a pu changer).
+# 0 : jamais de nouvel essai
+REPROBE_EVERY = int(os.getenv("OPENCRITIC_REPROBE_EVERY", "10"))
 
-    api_url = "https://api.zyte.com/v1/extract"
-    result = {
-        "id": int(game_id),
-        "name": None,
-        "top_critic_average": None,
-        "critics_recommend": None,
-        "player_rating": None,
-        "player_rating_count": None
-    }
+_tier_store = None
+_tier_store_lock = threading.Lock()
+
+def get_tier_store():
+    """
+    Mémoire par game ID du tier (static/browser) qui a produit la note joueurs au dernier run.
+    Dans Postgres (ingestion_state) dès que DB_URL est fourni, pour survivre aux conteneurs Kestra.
+    Best-effort : base injoignable -> None, le scraping continue sans mémoire.
+    Bloquant (connexion) : à appeler via asyncio.to_thread.
+    """
+    global _tier_store
+    with _tier_store_lock:
+        if _tier_store is None:
+            try:
+                _tier_store = StateStore("opencritic_tiers")
+            except Exception as e:
+                print(f"⚠️ Mémoire des tiers OpenCritic indisponible, scraping sans: {e}", file=sys.stderr)
+                # Pas de nouvelle tentative de connexion pour chaque jeu du batch
+                _tier_store = False
+    return _tier_store or None
 
-    # --- 1. APPEL API (JSON - Toujours rapide) ---
+async def load_tier_memory(game_id):
+    store = await asyncio.to_thread(get_tier_store)
+    if store is None:
+        return {}
     try:
-        r_api = requests.post(api_url, auth=(zyte_api_key, ""), json={
+        return await asyncio.to_thread(store.get, game_id, {})
+    except Exception as e:
+        print(f"⚠️ Lecture du tier OpenCritic impossible pour {game_id}: {e}", file=sys.stderr)
+        return {}
+
+async def save_tier_memory(game_id, memory):
+    store = await asyncio.to_thread(get_tier_store)
+    if store is None:
+        return
+    try:
+        await asyncio.to_thread(store.set, game_id, memory)
+    except Exception as e:
+        print(f"⚠️ Écriture du tier OpenCritic impossible pour {game_id}: {e}", file=sys.stderr)
+
+async def timed(latencies, tier, coro):
+    """Exécute un appel de tier et note sa latence (ms), succès ou échec."""
+    started = time.monotonic()
+    try:
+        return await coro
+    finally:
+        latencies[tier] = round((time.monotonic() - started) * 1000)
+
+async def fetch_api(client, game_id, result):
+    # --- APPEL API (JSON - Toujours rapide) ---
+    try:
+        r_api = await client.extract({
             "url": f"https://api.opencritic.com/api/game/{game_id}",
             "httpResponseBody": True
         }, timeout=30)
         
-        if r_api.ok:
-            data = json.loads(base64.b64decode(r_api.json()["httpResponseBody"]))
-            result["name"] = data.get("name")
-            if data.get("topCriticScore") not in [None, -1]:
-                result["top_critic_average"] = int(round(data["topCriticScore"]))
-            if data.get("percentRecommended") not in [None, -1]:
-                result["critics_recommend"] = int(round(data["percentRecommended"]))
+        body = decode_body(r_api)
+        with metrics.timer("parse"):
+            data = json.loads(body)
+        result["name"] = data.get("name")
+        if data.get("topCriticScore") not in [None, -1]:
+            result["top_critic_average"] = int(round(data["topCriticScore"]))
+        if data.get("percentRecommended") not in [None, -1]:
+            result["critics_recommend"] = int(round(data["percentRecommended"]))
     except Exception as e:
         print(f"DEBUG API FAIL: {e}", file=sys.stderr)
 
-    # --- 2. TENTATIVE WEB STATIQUE (Pas cher, rapide) ---
-    opencritic_web_url = f"https://opencritic.com/game/{game_id}/slug"
+async def fetch_static(client, web_url):
+    # --- TENTATIVE WEB STATIQUE (Pas cher, rapide) ---
     try:
-        r_static = requests.post(api_url, auth=(zyte_api_key, ""), json={
-            "url": opencritic_web_url,
+        r_static = await client.extract({
+            "url": web_url,
             "httpResponseBody": True
         }, timeout=30)
-        
-        if r_static.ok:
-            html = base64.b64decode(r_static.json()["httpResponseBody"]).decode("utf-8")
-            rating, count = get_player_data(html)
-            result["player_rating"] = rating
-            result["player_rating_count"] = count
+        return get_player_data(decode_body(r_static).decode("utf-8"))
     except Exception as e:
         print(f"DEBUG STATIC FAIL: {e}", file=sys.stderr)
+        return None, None
 
-    # --- 3. SI PAS DE RATING -> APPEL WEB BROWSER (Cher, lent mais nécessaire pour le count) ---
-    # Si on n'a ni note ni count après le statique (ou juste pas de note pour les SPA)
-    if result["player_rating"] is None:
+async def fetch_browser(client, web_url):
+    # --- APPEL WEB BROWSER (Cher, lent mais nécessaire pour le count sur les SPA) ---
+    r_browser = await client.extract({
+        "url": web_url,
+        "browserHtml": True,
+        "javascript": True
+    }, timeout=60)
+    return get_player_data(r_browser.get("browserHtml"))
+
+async def fetch_player(client, game_id, web_url, skip_static, result):
+    """
+    Note joueurs : tier navigateur mémorisé d'abord, sinon statique puis escalade navigateur.
+    Ne lève pas : les échecs finissent dans result["error"]. Renvoie (rating, count).
+    """
+    latencies = result["tier_latency_ms"]
+    browser_error = None
+    if skip_static:
+        try:
+            rating, count = await timed(latencies, "browser", fetch_browser(client, web_url))
+            result["tier"] = "browser"
+            return rating, count
+        except Exception as e:
+            # Échec ponctuel du navigateur : on repasse par le statique plutôt que de rendre une erreur
+            print(f"DEBUG BROWSER FAIL: {e}, falling back to static for ID {game_id}", file=sys.stderr)
+            browser_error = e
+
+    rating, count = await timed(latencies, "static", fetch_static(client, web_url))
+    result["tier"] = "static"
+
+    # --- SI PAS DE RATING AU STATIQUE -> ESCALADE NAVIGATEUR ---
+    if rating is None:
+        if browser_error is not None:
+            # Le navigateur vient d'échouer pour ce jeu : pas de second essai dans le même run
+            result["error"] = f"Browser scraping error: {str(browser_error)}"
+            return rating, count
         try:
             print(f"DEBUG: Player rating not found in static, launching browser for ID {game_id}...", file=sys.stderr)
-            r_browser = requests.post(api_url, auth=(zyte_api_key, ""), json={
-                "url": opencritic_web_url,
-                "browserHtml": True,
-                "javascript": True
-            }, timeout=60)
-            
-            if r_browser.ok:
-                html = r_browser.json().get("browserHtml")
-                rating, count = get_player_data(html)
-                result["player_rating"] = rating
-                result["player_rating_count"] = count
+            rating, count = await timed(latencies, "browser", fetch_browser(client, web_url))
+            result["tier"] = "browser"
         except Exception as e:
             result["error"] = f"Browser scraping error: {str(e)}"
+    return rating, count
+
+async def scrape_opencritic_async(client, game_id):
+    if not client.api_key:
+        return {"id": game_id, "error": "ZYTE_API_KEY manquante"}
+
+    result = {
+        "id": int(game_id),
+        "name": None,
+        "top_critic_average": None,
+        "critics_recommend": None,
+        "player_rating": None,
+        "player_rating_count": None,
+        "tier": None,
+        "tier_latency_ms": {}
+    }
+    opencritic_web_url = f"https://opencritic.com/game/{game_id}/slug"
+
+    memory = await load_tier_memory(game_id)
+    runs = memory.get("runs", 0) + 1
+    # Si le statique n'a rien donné la dernière fois, on part directement sur le navigateur
+    reprobe = REPROBE_EVERY > 0 and runs % REPROBE_EVERY == 0
+    skip_static = memory.get("tier") == "browser" and not reprobe
+
+    # API et note joueurs en parallèle : ils sont indépendants, et l'API est toujours attendue
+    _, (rating, count) = await asyncio.gather(
+        timed(result["tier_latency_ms"], "api", fetch_api(client, game_id, result)),
+        fetch_player(client, game_id, opencritic_web_url, skip_static, result)
+    )
+
+    result["player_rating"] = rating
+    result["player_rating_count"] = count
+
+    if "error" not in result:
+        await save_tier_memory(game_id, {"tier": result["tier"], "runs": runs})
 
     return result
 
+def scrape_opencritic(game_id):
+    return run_sync(scrape_opencritic_async, game_id)
+
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser()
-    parser.add_argument('id', type=int)
-    args = parser.parse_args()
-    print(json.dumps(scrape_opencritic(args.id)))
+    run_cli(scrape_opencritic_async, key="id", arg_type=int)